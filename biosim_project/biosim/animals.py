@@ -1,17 +1,52 @@
 # -*- coding: utf-8 -*-
 
-import random
+from bisect import bisect_right
+from itertools import accumulate
 from math import exp as e
+from . import randomness
 
 __author__ = 'Sigve Sorensen', 'Filip Rotnes'
 __email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
 
 
+class ParameterDict(dict):
+    """
+    Dictionary of class parameters that recompiles the derived constants
+    of its owner class whenever a value is changed
+    """
+
+    def __init__(self, owner, params):
+        """
+        :param owner: class (the class the parameters belong to)
+        :param params: dict
+        """
+
+        dict.__init__(self, params)
+        self.owner = owner
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self.owner.compile_parameters()
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self.owner.compile_parameters()
+
+    def __reduce__(self):
+        """
+        Pickles the parameters as a plain dict, without the owner class
+        """
+
+        return dict, (dict(self),)
+
+
 class Animal:
     """
     This class instantiates an animal
     """
 
+    __slots__ = ('_weight', '_age', '_phi', '_dirty')
+
     default_params = {'w_birth': None, 'sigma_birth': None, 'beta': None,
                       'a_half': None, 'phi_age': None, 'w_half': None,
                       'phi_weight': None, 'mu': None, 'lambda': None,
@@ -68,18 +103,123 @@ class Animal:
 
         return cls.default_params
 
-    def __init__(self, weight=default_params['w_birth'], age=0.0):
+    def __init_subclass__(cls, **kwargs):
+        """
+        Wraps the parameters of each species so that changing them
+        recompiles the species' constants
+        """
+
+        super().__init_subclass__(**kwargs)
+        if 'default_params' in cls.__dict__:
+            cls.default_params = ParameterDict(cls, cls.default_params)
+            cls.compile_parameters()
+
+    @classmethod
+    def compile_parameters(cls):
+        """
+        Copies the parameters used in the hot methods into plain class
+        attributes, and precomputes the derived constants
+        """
+
+        p = cls.default_params
+        cls._sigma_birth = p['sigma_birth']
+        cls._phi_age, cls._a_half = p['phi_age'], p['a_half']
+        cls._phi_weight, cls._w_half = p['phi_weight'], p['w_half']
+        cls._birth_threshold = p['zeta'] * (p['w_birth'] + p['sigma_birth'])
+        cls._gamma, cls._omega, cls._eta = p['gamma'], p['omega'], p['eta']
+        cls._mu, cls._beta, cls._F = p['mu'], p['beta'], p['F']
+        cls._delta_phi_max = p.get('DeltaPhiMax')
+
+    def __init__(self, weight=default_params['w_birth'], age=0.0, rng=None):
         """
         Creates the variables associated with the class
+        Fitness is computed when it is first read
+
+        :param rng: randomness.Stream (the default stream if not given)
+        """
+
+        rng = rng or randomness.default
+        self._weight = float(rng.generator.normal(weight, self._sigma_birth))
+        self._age = age
+        self._phi = None
+        self._dirty = True
+
+    @property
+    def weight(self):
+        """
+        Weight of the Animal. Setting it marks the fitness as outdated.
+
+        :return: float
+        """
+
+        return self._weight
+
+    @weight.setter
+    def weight(self, value):
+        self._weight = value
+        self._dirty = True
+
+    @property
+    def age(self):
+        """
+        Age of the Animal. Setting it marks the fitness as outdated.
+
+        :return: int
+        """
+
+        return self._age
+
+    @age.setter
+    def age(self, value):
+        self._age = value
+        self._dirty = True
+
+    @property
+    def phi(self):
+        """
+        Fitness of the Animal, recomputed only if weight or age has
+        changed since it was last computed or set
+
+        :return: float
+        """
+
+        if self._dirty:
+            self.fitness()
+        return self._phi
+
+    @phi.setter
+    def phi(self, value):
+        self._phi = value
+        self._dirty = False
+
+    @property
+    def phi_outdated(self):
         """
+        Returns whether weight or age has changed since the fitness was
+        last computed or set
 
-        self.weight = random.normalvariate(
-            weight, self.default_params['sigma_birth'])
-        self.age = age
-        self.phi = 1 / (1 + e(self.default_params['phi_age'] *
-                              (self.age - self.default_params['a_half']))) \
-            * 1 / (1 + e(-self.default_params['phi_weight'] *
-                         (self.weight - self.default_params['w_half'])))
+        :return: bool
+        """
+
+        return self._dirty
+
+    @classmethod
+    def from_state(cls, weight, age, phi):
+        """
+        Creates an animal with exactly the given weight, age and fitness,
+        without drawing a random weight
+
+        :param weight: float
+        :param age: int
+        :param phi: float
+        :return: Animal
+        """
+
+        animal = cls.__new__(cls)
+        animal.weight = weight
+        animal.age = age
+        animal.phi = phi
+        return animal
 
     def ages(self):
         """
@@ -88,15 +228,16 @@ class Animal:
 
         self.age += 1
 
-    def dies(self):
+    def dies(self, rng=None):
         """
         Decides if Animal dies
 
+        :param rng: randomness.Stream (the default stream if not given)
         :return: bool
         """
 
-        p_death = self.default_params['omega'] * (1 - self.phi)
-        return random.random() < p_death
+        p_death = self._omega * (1 - self.phi)
+        return (rng or randomness.default).generator.random() < p_death
 
     def fitness(self):
         """
@@ -105,30 +246,27 @@ class Animal:
         :return: float
         """
 
-        self.phi = 1 / (1 + e(self.default_params['phi_age'] *
-                              (self.age - self.default_params['a_half']))) \
-            * 1 / (1 + e(-self.default_params['phi_weight'] *
-                         (self.weight - self.default_params['w_half'])))
+        self.phi = 1 / (1 + e(self._phi_age * (self.age - self._a_half))) \
+            * 1 / (1 + e(-self._phi_weight * (self.weight - self._w_half)))
 
         return self.phi
 
-    def birth(self, n_animals):
+    def birth(self, n_animals, rng=None):
         """
         Decides whether an Animal will give birth or not
 
         :param n_animals: int
+        :param rng: randomness.Stream (the default stream if not given)
         :return: bool
         """
 
-        if self.weight < self.default_params['zeta'] *\
-                (self.default_params['w_birth'] +
-                    self.default_params['sigma_birth']):
+        if self.weight < self._birth_threshold:
             p_of_birth = 0
         else:
-            p_of_birth = min([1, self.default_params['gamma'] * self.phi *
-                              (n_animals - 1)])
+            p_of_birth = min(1, self._gamma * self.phi * (n_animals - 1))
 
-        reproduction_successful = random.random() <= p_of_birth
+        reproduction_successful = \
+            (rng or randomness.default).generator.random() <= p_of_birth
         return reproduction_successful
 
     def weightloss(self):
@@ -136,16 +274,42 @@ class Animal:
         Updates the weight, following an animal's weightloss during cycle
         """
 
-        self.weight -= self.default_params['eta'] * self.weight
+        self.weight -= self._eta * self.weight
 
     @property
     def migrating(self):
+        """
+        Decides whether the animal is ready to migrate, or not, drawing
+        from the default stream
+
+        :return: bool
+        """
+        return self.migrates()
+
+    def migrates(self, rng=None):
         """
         Decides whether the animal is ready to migrate, or not
 
+        :param rng: randomness.Stream (the default stream if not given)
         :return: bool
         """
-        return random.random() < self.default_params['mu'] * self.phi
+
+        draw = (rng or randomness.default).generator.random()
+        return draw < self._mu * self.phi
+
+    @staticmethod
+    def pick_destination(cum_props, rng=None):
+        """
+        Draws the index of the neighbour an animal migrates to, with
+        probability proportional to each neighbour's propensity
+
+        :param cum_props: list (cumulative propensities of the neighbours)
+        :param rng: randomness.Stream (the default stream if not given)
+        :return: int
+        """
+
+        draw = (rng or randomness.default).generator.random()
+        return bisect_right(cum_props, draw * cum_props[-1])
 
     @property
     def is_herbivore(self):
@@ -173,42 +337,60 @@ class Herbivore(Animal):
     Underclass of superclass Animal, Herbivore, with its default parameters.
     """
 
+    __slots__ = ()
+
     default_params = {'w_birth': 8.0, 'sigma_birth': 1.5, 'beta': 0.9,
                       'a_half': 40.0, 'phi_age': 0.2, 'w_half': 10.0,
                       'phi_weight': 0.1, 'mu': 0.25, 'lambda': 1.0,
                       'gamma': 0.2, 'zeta': 3.5, 'xi': 1.2,
                       'omega': 0.4, 'F': 10.0, 'eta': 0.05}
 
-    def __init__(self, weight=None, age=0):
+    def __init__(self, weight=None, age=0, rng=None):
         """
         Creates the variables associated with the underclass
+
+        :param rng: randomness.Stream (the default stream if not given)
         """
 
         if weight is None:
             weight = self.default_params['w_birth']
-        Animal.__init__(self, weight=weight, age=age)
+        Animal.__init__(self, weight=weight, age=age, rng=rng)
 
     def eating(self, available_fodder):
         """
         Updates the weight of Herbivore after eating
         """
 
-        self.weight += available_fodder * self.default_params['beta']
+        self.weight += available_fodder * self._beta
+
+    @classmethod
+    def cumulative_propensities(cls, neighbours):
+        """
+        Calculates the cumulative propensities of herbivores to migrate
+        to each neighbour. They are the same for every herbivore in a cell.
+
+        :param neighbours: list
+        :return: list
+        """
+
+        return list(accumulate(n.propensity(cls, n.abundance_fodder_h)
+                               for n in neighbours))
 
-    def new_grassland(self, neighbours):
+    def new_grassland(self, neighbours, cum_props=None, rng=None):
         """
         Decides where the migrating herbivore will migrate
 
         :param neighbours: list
+        :param cum_props: list (cumulative propensities, computed from
+                          neighbours if not given)
+        :param rng: randomness.Stream (the default stream if not given)
         :return: list
         """
-        props = [n.propensity(self, n.abundance_fodder_h) for n in neighbours]
-        prob_list = [prop / sum(props) for prop in props]
-        p = random.random()
-        i = 0
-        while p > sum(prob_list[0:i]):
-            i += 1
-        return neighbours[i - 1].new_pop[0]
+
+        if cum_props is None:
+            cum_props = self.cumulative_propensities(neighbours)
+        return neighbours[
+            self.pick_destination(cum_props, rng)].new_pop[0]
 
 
 class Carnivore(Animal):
@@ -216,6 +398,8 @@ class Carnivore(Animal):
     Underclass of superclass Animal, Carnivore, with its default parameters.
     """
 
+    __slots__ = ()
+
     default_params = {'w_birth': 6.0, 'sigma_birth': 1.0, 'beta': 0.75,
                       'a_half': 60.0, 'phi_age': 0.4, 'w_half': 4.0,
                       'phi_weight': 0.4, 'mu': 0.4, 'lambda': 1.0,
@@ -223,14 +407,16 @@ class Carnivore(Animal):
                       'omega': 0.9, 'F': 50.0,
                       'eta': 0.125, 'DeltaPhiMax': 10.0}
 
-    def __init__(self, weight=None, age=0):
+    def __init__(self, weight=None, age=0, rng=None):
         """
         Creates the variables associated with the underclass
+
+        :param rng: randomness.Stream (the default stream if not given)
         """
 
         if weight is None:
             weight = self.default_params['w_birth']
-        Animal.__init__(self, weight=weight, age=age)
+        Animal.__init__(self, weight=weight, age=age, rng=rng)
 
     def prob_eating(self, herbivore):
         """
@@ -241,7 +427,7 @@ class Carnivore(Animal):
         """
 
         delta_phi = self.phi - herbivore.phi
-        delta_phi_max = self.default_params['DeltaPhiMax']
+        delta_phi_max = self._delta_phi_max
 
         if delta_phi <= 0.:
             return 0
@@ -250,42 +436,76 @@ class Carnivore(Animal):
         else:
             return 1
 
+    def hunt(self, prey, alive, draws=None):
+        """
+        Carnivore hunts through the prey, least fit first, until it has
+        eaten its appetite F. Eaten herbivores are marked in alive.
+        One number is taken from draws for each living herbivore tried.
+
+        :param prey: list (herbivores in ascending order of fitness)
+        :param alive: list (bool for each herbivore in prey)
+        :param draws: iterator (uniform numbers; from the default stream if
+                      not given)
+        :return: int (number of herbivores eaten)
+        """
+
+        if draws is None:
+            draws = randomness.uniforms(randomness.default)
+        appetite = self._F
+        eaten = 0
+        kills = 0
+
+        for i, herb in enumerate(prey):
+            if eaten >= appetite:
+                break
+            if alive[i] and next(draws) < self.prob_eating(herb):
+                self.weight += self._beta * herb.weight
+                eaten += herb.weight
+                alive[i] = False
+                kills += 1
+
+        return kills
+
     def eating(self, herbs):
         """
         Updates the weight of carnivore after eating herbivore(s)
         Returns a list of surviving herbivores
 
-        :param herbs: list
+        :param herbs: list (herbivores in descending order of fitness)
         :return: list
         """
 
-        survivors = []
-        eaten = 0
+        prey = herbs[::-1]
+        alive = [True] * len(prey)
+        self.hunt(prey, alive)
+        return [herb for herb, survived in zip(prey, alive)
+                if survived][::-1]
 
-        for herb in herbs[::-1]:
-            if eaten < self.default_params['F'] \
-                    and random.random() < self.prob_eating(herb):
-                self.weight += self.default_params['beta'] * herb.weight
-                eaten += herb.weight
-
-                self.phi = self.fitness()
+    @classmethod
+    def cumulative_propensities(cls, neighbours):
+        """
+        Calculates the cumulative propensities of carnivores to migrate
+        to each neighbour. They are the same for every carnivore in a cell.
 
-            else:
-                survivors.append(herb)
+        :param neighbours: list
+        :return: list
+        """
 
-        return survivors
+        return list(accumulate(n.propensity(cls, n.abundance_fodder_c)
+                               for n in neighbours))
 
-    def new_hunting_land(self, neighbours):
+    def new_hunting_land(self, neighbours, cum_props=None, rng=None):
         """
         Decides where the migrating carnivore will migrate
 
         :param neighbours: list
+        :param cum_props: list (cumulative propensities, computed from
+                          neighbours if not given)
+        :param rng: randomness.Stream (the default stream if not given)
         :return: list
         """
-        props = [n.propensity(self, n.abundance_fodder_c) for n in neighbours]
-        prob_list = [prop / sum(props) for prop in props]
-        p = random.random()
-        i = 0
-        while p > sum(prob_list[0:i]):
-            i += 1
-        return neighbours[i - 1].new_pop[1]
+
+        if cum_props is None:
+            cum_props = self.cumulative_propensities(neighbours)
+        return neighbours[
+            self.pick_destination(cum_props, rng)].new_pop[1]
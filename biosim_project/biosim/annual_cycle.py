@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""
+The phases of the annual cycle every engine backend carries out.
+
+AnnualCycle fixes the order of the phases in cycle() and leaves each phase
+to the backend, as one method acting on the whole island. Every backend
+runs the same phases in the same order, so two backends can be stepped
+through a year side by side and compared after each phase:
+
+start_of_year: takes in animals placed since the last year
+regenerate: regrows the fodder of every cell
+fitness_sort: orders the animals of each cell by descending fitness
+eat_request_herb: herbivores graze, fittest first
+eat_request_carn: carnivores hunt, fittest first
+update_fitness: recomputes fitness after eating
+reproduction: animals give birth
+migrate_island: animals move to neighbouring cells
+end_of_year: animals age, lose weight and die
+"""
+
+from abc import ABC, abstractmethod
+
+__author__ = 'Sigve Sorensen', 'Filip Rotnes'
+__email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
+
+
+class AnnualCycle(ABC):
+    """
+    This class runs the phases of the annual cycle of an island in order
+    """
+
+    phases = ('start_of_year', 'regenerate', 'fitness_sort',
+              'eat_request_herb', 'eat_request_carn', 'update_fitness',
+              'reproduction', 'migrate_island', 'end_of_year')
+
+    def cycle(self):
+        """
+        Conducts one cycle on the island, running each phase in turn
+
+        :return: tuple (number of herbivores and carnivores)
+        """
+
+        for phase in self.phases:
+            getattr(self, phase)()
+        self.year += 1
+
+        return self.total_island_population
+
+    @property
+    @abstractmethod
+    def total_island_population(self):
+        """
+        Calculates total population on the island
+
+        :return: tuple
+        """
+
+    @abstractmethod
+    def start_of_year(self):
+        """
+        Takes in the animals placed on the island since the last year
+        """
+
+    @abstractmethod
+    def regenerate(self):
+        """
+        Regenerates fodder on the whole island
+        """
+
+    @abstractmethod
+    def fitness_sort(self):
+        """
+        Sorts the animals of each cell by descending fitness
+        """
+
+    @abstractmethod
+    def eat_request_herb(self):
+        """
+        Herbivores eat in each cell in order of fitness
+        """
+
+    @abstractmethod
+    def eat_request_carn(self):
+        """
+        Carnivores hunt in each cell in order of fitness
+        """
+
+    @abstractmethod
+    def update_fitness(self):
+        """
+        Updates fitness for all animals
+        """
+
+    @abstractmethod
+    def reproduction(self):
+        """
+        Animals give birth
+        """
+
+    @abstractmethod
+    def migrate_island(self):
+        """
+        Animals migrate to neighbouring cells
+        """
+
+    @abstractmethod
+    def end_of_year(self):
+        """
+        Ages all animals, applies the yearly weightloss, updates fitness
+        and removes dying animals
+        """
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+Registry of the engine backends a simulation can run on.
+
+A backend is an island class. BioSim creates one instance per simulation,
+passing the seed and the ParameterSet of the simulation as the seed and
+params keywords. The island draws all its random numbers from generators
+derived from its seed, so islands in one process do not affect each
+other. BioSim only uses the members listed in interface: the map and
+initial animals are given to populated_island, more animals to
+distribute_animals, each year is run by cycle, and the results are read
+from the population properties. The interface also holds the phases of
+annual_cycle.AnnualCycle, which the built-in backends implement, so
+backends can be stepped through a year and compared phase by phase. How
+each phase is carried out is up to the backend.
+
+The 'reference' backend is Island, with one object per animal, and is the
+implementation other backends are validated against.
+"""
+
+from .annual_cycle import AnnualCycle
+from .island import Island
+from .engine import ArrayIsland, CohortIsland
+
+__author__ = 'Sigve Sorensen', 'Filip Rotnes'
+__email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
+
+interface = ('populated_island', 'distribute_animals', 'cycle',
+             'total_island_population', 'population_array',
+             'population_distribution', 'map_from_string') + \
+    AnnualCycle.phases
+
+registry = {}
+
+
+def check_backend(island_class):
+    """
+    Checks that an island class has every member of the backend interface
+
+    :param island_class: class
+    """
+
+    missing = [member for member in interface
+               if not hasattr(island_class, member)]
+    if missing:
+        raise TypeError(str(island_class.__name__) +
+                        ' is missing backend members: ' +
+                        ', '.join(missing))
+
+
+def register_backend(name, island_class):
+    """
+    Makes an island class available to BioSim under the given name
+
+    :param name: str
+    :param island_class: class (fulfilling the backend interface)
+    """
+
+    check_backend(island_class)
+    registry[name] = island_class
+
+
+def get_backend(backend):
+    """
+    Returns the island class of a backend, given by name or as a class
+
+    :param backend: str or class
+    :return: class
+    """
+
+    if isinstance(backend, type):
+        check_backend(backend)
+        return backend
+    if backend not in registry:
+        raise ValueError('Invalid engine: ' + str(backend) +
+                         '. Permitted engines: ' + ', '.join(registry))
+    return registry[backend]
+
+
+def available_backends():
+    """
+    Returns the names of the registered backends
+
+    :return: list
+    """
+
+    return sorted(registry)
+
+
+register_backend('reference', Island)
+register_backend('vectorized', ArrayIsland)
+register_backend('cohort', CohortIsland)
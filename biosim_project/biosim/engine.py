@@ -0,0 +1,519 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from .island import *
+from .population import AnimalArrays, CohortArrays
+from . import kernels
+
+__author__ = 'Sigve Sorensen', 'Filip Rotnes'
+__email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
+
+
+class ArrayIsland(Island):
+    """
+    This class instantiates an island where every animal is stored in
+    flat arrays tagged with a cell index. Each phase of the annual cycle
+    is run as one batched NumPy operation over the whole island.
+
+    Animals placed with distribute_animals are moved from the landscape
+    cells into the arrays at the start of the next cycle.
+    """
+
+    arrays_class = AnimalArrays
+
+    def __init__(self, seed=None, params=None):
+        """
+        Creates the variables associated with the class
+
+        :param seed: int (seed of the NumPy generator of the island; fresh
+                     entropy is used if not given)
+        :param params: ParameterSet
+        """
+
+        Island.__init__(self, seed, params)
+        self.rng = np.random.default_rng(self.seed_sequence)
+        self.herbs = self.arrays_class(self.herbivore)
+        self.carns = self.arrays_class(self.carnivore)
+        self.cells = None
+        self.cell_fodder = None
+
+    def map_from_string(self, map_str=None):
+        """
+        Creates the numpy array map and the flat per-cell arrays
+
+        :param map_str: multi line string
+        :return: numpy.ndarray
+        """
+
+        Island.map_from_string(self, map_str)
+        self.cells = self.map.ravel()
+        self.cell_fodder = self.fodder.reshape(-1)
+        self.herbs = self.arrays_class(self.herbivore)
+        self.carns = self.arrays_class(self.carnivore)
+        return self.map
+
+    def absorb_animals(self):
+        """
+        Moves animals held by the landscape cells into the island arrays
+        """
+
+        for index, cell in enumerate(self.cells):
+            if cell.pop_animals[0] or cell.pop_animals[1]:
+                for arrays, animals in zip((self.herbs, self.carns),
+                                           cell.pop_animals):
+                    arrays.extend([animal.weight for animal in animals],
+                                  [animal.age for animal in animals],
+                                  [animal.phi for animal in animals], index)
+                cell.pop_animals = [[], []]
+
+    def start_of_year(self):
+        """
+        Moves animals placed since the last year into the island arrays,
+        and forgets the placement streams of the last year
+        """
+
+        self.absorb_animals()
+        self.placements = {}
+
+    def update_fitness(self):
+        """
+        Updates fitness for all animals
+        """
+
+        for arrays in (self.herbs, self.carns):
+            arrays.phi[:] = kernels.fitness(arrays.species.default_params,
+                                            arrays.age, arrays.weight)
+
+    def fitness_sort(self):
+        """
+        Sorts the animals of both species by cell and fitness
+        """
+
+        self.sort_arrays(self.herbs)
+        self.sort_arrays(self.carns)
+
+    @staticmethod
+    def sort_arrays(arrays):
+        """
+        Sorts animals by cell, and by descending fitness within each cell.
+        Both passes are stable sorts, which run in close to linear time on
+        the nearly sorted order left from the previous year.
+
+        :param arrays: AnimalArrays
+        """
+
+        order = np.argsort(-arrays.phi, kind='stable')
+        order = order[np.argsort(arrays.cell[order], kind='stable')]
+        if np.any(order != np.arange(arrays.n)):
+            arrays.reorder(order)
+
+    @staticmethod
+    def group_starts(cells):
+        """
+        Returns, for each animal in cell-sorted arrays, the row index where
+        its cell's group begins
+
+        :param cells: numpy.ndarray (sorted cell indices)
+        :return: numpy.ndarray
+        """
+
+        rows = np.arange(cells.size)
+        first = np.ones(cells.size, dtype=bool)
+        first[1:] = cells[1:] != cells[:-1]
+        return np.maximum.accumulate(np.where(first, rows, 0))
+
+    def eat_request_herb(self):
+        """
+        Herbivores eat in each cell in order of fitness; the fittest eats
+        first and each takes its appetite F until the fodder runs out
+        """
+
+        herbs = self.herbs
+        if not herbs.n:
+            return
+        p = self.herbivore.default_params
+        rank = np.arange(herbs.n) - self.group_starts(herbs.cell)
+        fodder = self.cell_fodder
+        eaten = kernels.grazing(fodder[herbs.cell], rank, p['F'])
+        fodder -= np.bincount(herbs.cell, eaten, minlength=fodder.size)
+        np.maximum(fodder, 0, out=fodder)
+        fed = np.flatnonzero(eaten)
+        herbs.weight[fed] += p['beta'] * eaten[fed]
+        herbs.phi[fed] = kernels.fitness(p, herbs.age[fed], herbs.weight[fed])
+
+    def eat_request_carn(self):
+        """
+        Carnivores hunt in each cell in order of fitness. Each carnivore
+        tries the least fit herbivore first, and stops once it has eaten F.
+        The hunt runs in a compiled kernel when Numba is installed, and
+        draws its random numbers as it needs them.
+        """
+
+        herbs, carns = self.herbs, self.carns
+        if not herbs.n or not carns.n:
+            return
+        p = self.carnivore.default_params
+        edges = np.arange(self.cells.size + 1)
+        herb_bounds = np.searchsorted(herbs.cell, edges)
+        carn_bounds = np.searchsorted(carns.cell, edges)
+        n_herbs, n_carns = np.diff(herb_bounds), np.diff(carn_bounds)
+        cells = np.flatnonzero((n_herbs > 0) & (n_carns > 0))
+        alive = kernels.hunting(
+            cells, herb_bounds, carn_bounds, herbs.phi, herbs.weight,
+            carns.age, carns.weight, carns.phi, self.rng, float(p['F']),
+            float(p['beta']), float(p['DeltaPhiMax']), float(p['phi_age']),
+            float(p['a_half']), float(p['phi_weight']), float(p['w_half']))
+        herbs.keep(alive)
+
+    def reproduction(self):
+        """
+        Each animal gives birth with the probability given by its fitness
+        and the number of animals of its species in the cell
+        """
+
+        for arrays in (self.herbs, self.carns):
+            if not arrays.n:
+                continue
+            p = arrays.species.default_params
+            n_same = np.bincount(arrays.cell)[arrays.cell]
+            parents, newborn_weight = kernels.births(
+                p, arrays.weight, arrays.phi, n_same, self.rng)
+            arrays.weight[parents] -= p['xi'] * newborn_weight
+            arrays.extend(newborn_weight, 0,
+                          kernels.fitness(p, 0, newborn_weight),
+                          arrays.cell[parents])
+
+    def abundance_fodder(self):
+        """
+        Returns the relative abundance of fodder in every cell, for
+        herbivores and for carnivores
+
+        :return: tuple of numpy.ndarray
+        """
+
+        n_cells = self.cells.size
+        n_herbs = self.herbs.cell_counts(n_cells)
+        n_carns = self.carns.cell_counts(n_cells)
+        herb_mass = self.herbs.cell_mass(n_cells)
+        herb_f = self.herbivore.default_params['F']
+        carn_f = self.carnivore.default_params['F']
+        return (self.cell_fodder / ((n_herbs + 1) * herb_f),
+                herb_mass / ((n_carns + 1) * carn_f))
+
+    def edge_exponents(self, exponent):
+        """
+        Returns the exponent of the propensity of every neighbour edge,
+        shifted so that the largest exponent among the neighbours of each
+        cell is 0. Propensities of the neighbours of one cell then keep
+        their ratios while staying between 0 and 1, so the cumulative sum
+        over all edges does not lose the smaller cells to rounding.
+
+        :param exponent: numpy.ndarray (lambda * epsilon for every cell)
+        :return: numpy.ndarray (one value per edge in neighbour_idx)
+        """
+
+        owner = np.repeat(np.arange(self.cells.size),
+                          np.diff(self.neighbour_ptr))
+        edge_exponent = exponent[self.neighbour_idx]
+        largest = np.full(self.cells.size, -np.inf)
+        np.maximum.at(largest, owner, edge_exponent)
+        return edge_exponent - largest[owner]
+
+    def migrate_island(self):
+        """
+        Moves each migrating animal to one of the neighbouring cells of its
+        cell, chosen with probability proportional to the propensity.
+        Animals in isolated cells stay where they are.
+        """
+
+        start, end = self.neighbour_ptr[:-1], self.neighbour_ptr[1:]
+        for arrays, epsilon in zip((self.herbs, self.carns),
+                                   self.abundance_fodder()):
+            if not arrays.n:
+                continue
+            p = arrays.species.default_params
+            moving = self.rng.random(arrays.n) < p['mu'] * arrays.phi
+            moving &= ~self.isolated[arrays.cell]
+            movers = np.flatnonzero(moving)
+
+            props = np.exp(self.edge_exponents(p['lambda'] * epsilon))
+            cum_props = np.concatenate(([0.], np.cumsum(props)))
+
+            origin = arrays.cell[movers]
+            base = cum_props[start[origin]]
+            total = cum_props[end[origin]] - base
+            target = base + self.rng.random(movers.size) * total
+            edge = np.searchsorted(cum_props, target, side='right') - 1
+            edge = np.clip(edge, start[origin], end[origin] - 1)
+            arrays.cell[movers] = self.neighbour_idx[edge]
+
+    def aging(self):
+        """
+        Age all animals with one cycle
+        """
+
+        for arrays in (self.herbs, self.carns):
+            arrays.age[:] += 1
+
+    def weightloss(self):
+        """
+        Updates the weight of all animals, following a cycle weightloss
+        """
+
+        for arrays in (self.herbs, self.carns):
+            arrays.weight[:] -= arrays.species.default_params['eta'] * \
+                arrays.weight
+
+    def death(self):
+        """
+        Removes dying animals
+        """
+
+        for arrays in (self.herbs, self.carns):
+            arrays.discard(kernels.deaths(arrays.species.default_params,
+                                          arrays.phi, self.rng))
+
+    def end_of_year(self):
+        """
+        Ages all animals, applies the yearly weightloss, updates fitness and
+        removes dying animals, in one pass over each species
+        """
+
+        for arrays in (self.herbs, self.carns):
+            params = arrays.species.default_params
+            arrays.age[:] += 1
+            arrays.weight[:] -= params['eta'] * arrays.weight
+            arrays.phi[:] = kernels.fitness(params, arrays.age, arrays.weight)
+            arrays.discard(kernels.deaths(params, arrays.phi, self.rng))
+
+    @property
+    def total_island_population(self):
+        """
+        Calculates total population on the island
+
+        :return: tuple
+        """
+
+        self.absorb_animals()
+        return self.herbs.n_animals, self.carns.n_animals
+
+    def population_array(self, herbivore=True):
+        """
+        Returns a population array
+        :param herbivore: bool
+        :return: numpy.ndarray
+        """
+
+        self.absorb_animals()
+        arrays = self.herbs if herbivore else self.carns
+        return arrays.cell_counts(self.cells.size).reshape(
+            self.map.shape).astype(float)
+
+    @property
+    def population_distribution(self):
+        """
+        Returns the population of herbivores and carnivores for each cell
+        Cells are listed row by row
+
+        :return: numpy.ndarray
+        """
+
+        self.absorb_animals()
+        n_cells = self.cells.size
+        return np.column_stack((self.herbs.cell_counts(n_cells),
+                                self.carns.cell_counts(n_cells)))
+
+
+class CohortIsland(ArrayIsland):
+    """
+    This class instantiates an island where animals are stored as cohorts:
+    animals of one species in the same cell, of the same age and in the
+    same weight bin are kept as one row with a count. Births, deaths and
+    migration are drawn per cohort with binomial and multinomial draws, so
+    the work grows with the number of cohorts rather than of animals.
+
+    A cohort is split when its animals no longer share the same state, and
+    cohorts are joined again after reproduction and at the end of the year.
+    Joined animals get the mean weight of their bin, which is the only
+    approximation made relative to the vectorized engine.
+
+    The hunt still visits every carnivore and herbivore cohort pair in a
+    cell. It runs in a compiled kernel when Numba is installed; without
+    Numba, and with herds small enough that most cohorts hold one animal,
+    an island with carnivores runs no faster than with the reference
+    engine. The cohort engine pays off for very large herds.
+    """
+
+    arrays_class = CohortArrays
+    weight_bin = 0.5
+
+    def absorb_animals(self):
+        """
+        Moves animals held by the landscape cells into the island cohorts
+        """
+
+        n_rows = self.herbs.n, self.carns.n
+        ArrayIsland.absorb_animals(self)
+        for arrays, n in zip((self.herbs, self.carns), n_rows):
+            if arrays.n != n:
+                arrays.merge(self.weight_bin)
+
+    def eat_request_herb(self):
+        """
+        Herbivores eat in each cell in order of fitness. Each cohort is
+        split into the animals that eat their full appetite, at most one
+        animal that eats the remaining fodder, and the animals left hungry.
+        """
+
+        herbs = self.herbs
+        if not herbs.n:
+            return
+        p = self.herbivore.default_params
+        count = herbs.count
+        before = np.cumsum(count) - count
+        rank = before - before[self.group_starts(herbs.cell)]
+        fodder = self.cell_fodder
+        left = np.maximum(fodder[herbs.cell] - rank * p['F'], 0)
+        n_full = np.minimum(count, np.floor(left / p['F'])).astype(int)
+        rest = left - n_full * p['F']
+        n_part = ((n_full < count) & (rest > 0)).astype(int)
+        fodder -= np.bincount(herbs.cell, n_full * p['F'] + n_part * rest,
+                              minlength=fodder.size)
+        np.maximum(fodder, 0, out=fodder)
+
+        parts = np.column_stack((n_full, n_part, count - n_full - n_part))
+        gains = np.column_stack((np.full(herbs.n, float(p['F'])), rest,
+                                 np.zeros(herbs.n)))
+        new = parts.ravel() > 0
+        herbs.gather(np.repeat(np.arange(herbs.n), 3)[new],
+                     parts.ravel()[new])
+        fed = np.flatnonzero(gains.ravel()[new])
+        herbs.weight[fed] += p['beta'] * gains.ravel()[new][fed]
+        herbs.phi[fed] = kernels.fitness(p, herbs.age[fed], herbs.weight[fed])
+
+    def eat_request_carn(self):
+        """
+        Carnivores hunt in each cell in order of fitness, each trying the
+        herbivore cohorts from the least fit. Within a cohort, the number
+        of herbivores passed over before the next kill is drawn from a
+        geometric distribution. Carnivore cohorts are split into single
+        animals, as each ends the hunt with its own weight. The hunt runs
+        in a compiled kernel when Numba is installed.
+        """
+
+        herbs, carns = self.herbs, self.carns
+        if not herbs.n or not carns.n:
+            return
+        p = self.carnivore.default_params
+        carns.gather(np.repeat(np.arange(carns.n), carns.count), 1)
+        edges = np.arange(self.cells.size + 1)
+        herb_bounds = np.searchsorted(herbs.cell, edges)
+        carn_bounds = np.searchsorted(carns.cell, edges)
+        cells = np.flatnonzero((np.diff(herb_bounds) > 0) &
+                               (np.diff(carn_bounds) > 0))
+        alive = herbs.count
+        kernels.cohort_hunting(
+            cells, herb_bounds, carn_bounds, herbs.phi, herbs.weight, alive,
+            carns.age, carns.weight, carns.phi, self.rng, float(p['F']),
+            float(p['beta']), float(p['DeltaPhiMax']), float(p['phi_age']),
+            float(p['a_half']), float(p['phi_weight']), float(p['w_half']))
+        herbs.keep(alive > 0)
+
+    def reproduction(self):
+        """
+        The number of parents in each cohort is drawn from a binomial
+        distribution. Parents are split from their cohorts, as each loses
+        the weight of its own newborn.
+        """
+
+        for arrays in (self.herbs, self.carns):
+            if not arrays.n:
+                continue
+            p = arrays.species.default_params
+            n_same = arrays.cell_counts(self.cells.size)[arrays.cell]
+            p_birth = np.where(
+                arrays.weight < p['zeta'] * (p['w_birth'] + p['sigma_birth']),
+                0, np.minimum(1, p['gamma'] * arrays.phi * (n_same - 1)))
+            n_parents = self.rng.binomial(arrays.count, p_birth)
+            if not n_parents.any():
+                continue
+            parents = np.repeat(np.arange(arrays.n), n_parents)
+            newborn_weight = self.rng.normal(p['w_birth'], p['sigma_birth'],
+                                             parents.size)
+            n_rest = arrays.count - n_parents
+            rest = np.flatnonzero(n_rest)
+            arrays.gather(np.concatenate((rest, parents)),
+                          np.concatenate((n_rest[rest],
+                                          np.ones(parents.size, dtype=int))))
+            arrays.weight[rest.size:] -= p['xi'] * newborn_weight
+            arrays.extend(newborn_weight, 0,
+                          kernels.fitness(p, 0, newborn_weight),
+                          arrays.cell[rest.size:])
+            arrays.merge(self.weight_bin)
+
+    def migrate_island(self):
+        """
+        The number of migrating animals in each cohort is drawn from a
+        binomial distribution, and spread over the neighbouring cells with
+        a multinomial draw weighted by the propensities
+        """
+
+        start, end = self.neighbour_ptr[:-1], self.neighbour_ptr[1:]
+        width = int(np.diff(self.neighbour_ptr).max())
+        if not width:
+            return
+        slot = np.arange(width)
+        for arrays, epsilon in zip((self.herbs, self.carns),
+                                   self.abundance_fodder()):
+            if not arrays.n:
+                continue
+            p = arrays.species.default_params
+            movers = self.rng.binomial(arrays.count,
+                                       np.minimum(1, p['mu'] * arrays.phi))
+            movers[self.isolated[arrays.cell]] = 0
+            rows = np.flatnonzero(movers)
+            if not rows.size:
+                continue
+
+            origin = arrays.cell[rows]
+            edge = start[origin][:, None] + slot
+            valid = edge < end[origin][:, None]
+            edge = np.where(valid, edge, 0)
+            props = np.where(valid, np.exp(
+                self.edge_exponents(p['lambda'] * epsilon))[edge], 0)
+            moved = self.rng.multinomial(
+                movers[rows], props / props.sum(axis=1, keepdims=True))
+
+            new = moved.ravel() > 0
+            n_rows = arrays.n
+            arrays.gather(np.concatenate((np.arange(n_rows),
+                                          np.repeat(rows, width)[new])),
+                          np.concatenate((arrays.count - movers,
+                                          moved.ravel()[new])))
+            arrays.cell[n_rows:] = self.neighbour_idx[edge.ravel()[new]]
+
+    def death(self):
+        """
+        Removes dying animals, drawing the number of deaths in each cohort
+        """
+
+        for arrays in (self.herbs, self.carns):
+            arrays.count[:] -= self.rng.binomial(
+                arrays.count,
+                arrays.species.default_params['omega'] * (1 - arrays.phi))
+            arrays.keep(arrays.count > 0)
+
+    def end_of_year(self):
+        """
+        Ages all animals, applies the yearly weightloss, updates fitness,
+        removes dying animals and joins cohorts that have become alike
+        """
+
+        for arrays in (self.herbs, self.carns):
+            params = arrays.species.default_params
+            arrays.age[:] += 1
+            arrays.weight[:] -= params['eta'] * arrays.weight
+            arrays.phi[:] = kernels.fitness(params, arrays.age, arrays.weight)
+            arrays.count[:] -= self.rng.binomial(
+                arrays.count, params['omega'] * (1 - arrays.phi))
+            arrays.merge(self.weight_bin)
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+
+"""
+Runs replicates of one scenario in parallel worker processes.
+
+Workers import only the simulation engines, not the plotting in
+simulation.py. The ensemble takes a copy of its parameters when created
+and sends it with every task, so workers run with the same parameters
+whatever the start method of the pool.
+"""
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from .parameters import ParameterSet
+from . import backends
+
+__author__ = 'Sigve Sorensen', 'Filip Rotnes'
+__email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
+
+
+def run_replicate(island_map, ini_pop, seed, num_years, engine='reference',
+                  params=None):
+    """
+    Runs one replicate without graphics, seeded the same way as BioSim
+
+    :param island_map: multi line string
+    :param ini_pop: list of dictionaries
+    :param seed: int
+    :param num_years: int
+    :param engine: str or class (backend)
+    :param params: dict (class name: dict of parameters)
+    :return: numpy.ndarray (herbivore and carnivore totals, one row for
+             the start and one for each year)
+    """
+
+    island = backends.get_backend(engine)(seed=seed,
+                                          params=ParameterSet(params))
+    island.populated_island(island_map, ini_pop)
+    totals = np.empty((num_years + 1, 2), dtype=int)
+    totals[0] = island.total_island_population
+    for year in range(num_years):
+        totals[year + 1] = island.cycle()
+    return totals
+
+
+class StreamingQuantiles:
+    """
+    Estimates quantiles of a stream of equally shaped arrays, element by
+    element, with the P-square algorithm of Jain and Chlamtac (1985).
+    Five markers are kept per element and quantile instead of the
+    observations.
+    """
+
+    def __init__(self, probs):
+        """
+        Creates the variables associated with the class
+
+        :param probs: list (quantile probabilities, between 0 and 1)
+        """
+
+        self.probs = np.asarray(probs, dtype=float)
+        self.count = 0
+        self.first = []
+        self.heights = None
+        self.positions = None
+        self.desired = None
+        self.increments = None
+
+    def _start(self):
+        """
+        Places the markers on the first five observations
+        """
+
+        first = np.sort(np.stack(self.first), axis=0)
+        extra = (1,) * (first.ndim - 1)
+        p = self.probs.reshape((-1, 1) + extra)
+        self.heights = np.repeat(first[None], self.probs.size, axis=0)
+        self.positions = np.broadcast_to(
+            np.arange(1., 6.).reshape((1, 5) + extra),
+            self.heights.shape).copy()
+        self.desired = np.broadcast_to(
+            np.concatenate((np.ones_like(p), 1 + 2 * p, 1 + 4 * p,
+                            3 + 2 * p, np.full_like(p, 5.)), axis=1),
+            self.heights.shape).copy()
+        self.increments = np.concatenate(
+            (np.zeros_like(p), p / 2, p, (1 + p) / 2, np.ones_like(p)),
+            axis=1)
+        self.first = []
+
+    def add(self, values):
+        """
+        Adds one observation of every element
+
+        :param values: array_like
+        """
+
+        values = np.asarray(values, dtype=float)
+        self.count += 1
+        if self.heights is None:
+            self.first.append(values)
+            if self.count == 5:
+                self._start()
+            return
+
+        h, n = self.heights, self.positions
+        np.minimum(h[:, 0], values, out=h[:, 0])
+        np.maximum(h[:, 4], values, out=h[:, 4])
+        cell = sum((values >= h[:, i]).astype(int) for i in (1, 2, 3))
+        for i in (1, 2, 3, 4):
+            n[:, i] += cell < i
+        self.desired += self.increments
+
+        for i in (1, 2, 3):
+            offset = self.desired[:, i] - n[:, i]
+            up = (offset >= 1) & (n[:, i + 1] - n[:, i] > 1)
+            down = (offset <= -1) & (n[:, i - 1] - n[:, i] < -1)
+            step = np.where(up, 1., -1.)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                parabolic = h[:, i] + step / (n[:, i + 1] - n[:, i - 1]) * (
+                    (n[:, i] - n[:, i - 1] + step) *
+                    (h[:, i + 1] - h[:, i]) / (n[:, i + 1] - n[:, i]) +
+                    (n[:, i + 1] - n[:, i] - step) *
+                    (h[:, i] - h[:, i - 1]) / (n[:, i] - n[:, i - 1]))
+                linear = np.where(
+                    up, h[:, i] + (h[:, i + 1] - h[:, i]) /
+                    (n[:, i + 1] - n[:, i]),
+                    h[:, i] - (h[:, i - 1] - h[:, i]) /
+                    (n[:, i - 1] - n[:, i]))
+            inside = (h[:, i - 1] < parabolic) & (parabolic < h[:, i + 1])
+            move = up | down
+            h[:, i] = np.where(move, np.where(inside, parabolic, linear),
+                               h[:, i])
+            n[:, i] += np.where(move, step, 0.)
+
+    @property
+    def quantiles(self):
+        """
+        Current estimates, one per quantile probability along the first
+        axis. Exact while fewer than five observations have been added.
+
+        :return: numpy.ndarray
+        """
+
+        if self.heights is None:
+            if not self.first:
+                return None
+            return np.quantile(np.stack(self.first), self.probs, axis=0)
+        return self.heights[:, 2].copy()
+
+
+class BioSimEnsemble:
+    """
+    This class runs replicates of one scenario, one per seed, in a pool of
+    worker processes. The yearly totals of each replicate are added to
+    running statistics as soon as it finishes and then discarded.
+    """
+
+    def __init__(self, island_map, ini_pop, seeds, engine='reference',
+                 quantiles=(0.05, 0.5, 0.95), max_workers=None,
+                 mp_context=None, params=None):
+        """
+        Creates the variables associated with the class
+
+        :param island_map: multi line string
+        :param ini_pop: list of dictionaries
+        :param seeds: list (one replicate per seed)
+        :param engine: str or class (backend)
+        :param quantiles: tuple (quantile probabilities to estimate)
+        :param max_workers: int (worker processes; the number of CPUs
+                            if not given)
+        :param mp_context: multiprocessing context for the pool
+        :param params: ParameterSet or dict (class name: dict of
+                       parameters, applied on top of the class defaults)
+        """
+
+        backends.get_backend(engine)
+        self.island_map = island_map
+        self.ini_pop = ini_pop
+        self.seeds = list(seeds)
+        if not isinstance(params, ParameterSet):
+            params = ParameterSet(params)
+        self.params = params.as_dict()
+        self.engine = engine
+        self.quantile_probs = tuple(quantiles)
+        self.max_workers = max_workers
+        self.mp_context = mp_context
+        self.n_replicates = 0
+        self._sum = None
+        self._extinct = None
+        self._quantiles = None
+
+    def simulate(self, num_years):
+        """
+        Runs every replicate for num_years years, replacing the statistics
+        of any earlier run. Replicates are added in the order of the seeds,
+        as the quantile estimates depend on the order of the observations.
+
+        :param num_years: int
+        """
+
+        self.n_replicates = 0
+        self._sum = np.zeros((num_years + 1, 2))
+        self._extinct = np.zeros((num_years + 1, 2), dtype=int)
+        self._quantiles = StreamingQuantiles(self.quantile_probs)
+        with ProcessPoolExecutor(max_workers=self.max_workers,
+                                 mp_context=self.mp_context) as pool:
+            n_seeds = len(self.seeds)
+            for totals in pool.map(run_replicate, [self.island_map] * n_seeds,
+                                   [self.ini_pop] * n_seeds, self.seeds,
+                                   [num_years] * n_seeds,
+                                   [self.engine] * n_seeds,
+                                   [self.params] * n_seeds):
+                self.add_replicate(totals)
+
+    def add_replicate(self, totals):
+        """
+        Adds the yearly totals of one replicate to the statistics
+
+        :param totals: numpy.ndarray (one row per year, herbivores and
+                       carnivores)
+        """
+
+        self.n_replicates += 1
+        self._sum += totals
+        self._extinct += totals == 0
+        self._quantiles.add(totals)
+
+    @property
+    def mean(self):
+        """
+        Mean number of herbivores and carnivores, one row per year
+
+        :return: numpy.ndarray
+        """
+
+        return self._sum / self.n_replicates
+
+    @property
+    def quantiles(self):
+        """
+        Estimated quantiles of the number of herbivores and carnivores,
+        one row per year, keyed by quantile probability
+
+        :return: dict
+        """
+
+        return dict(zip(self.quantile_probs, self._quantiles.quantiles))
+
+    @property
+    def extinction_probability(self):
+        """
+        Fraction of replicates in which herbivores and carnivores are
+        extinct, one row per year
+
+        :return: numpy.ndarray
+        """
+
+        return self._extinct / self.n_replicates
@@ -2,51 +2,141 @@
 
 import numpy as np
 from .landscape import *
-import random
+from .annual_cycle import AnnualCycle
+from . import randomness
 
 __author__ = 'Sigve Sorensen', 'Filip Rotnes'
 __email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
 
 
-class Island:
+class Island(AnnualCycle):
     """
     This class instantiates an island
+    Each phase of the cycle visits the cells holding animals one at a
+    time, in row-by-row order, and draws from the random stream of the
+    cell and the current year.
     """
 
-    def __init__(self):
+    landscape_types = {'O': Ocean, 'J': Jungle, 'S': Savannah,
+                       'D': Desert, 'M': Mountain}
+    herbivore = Herbivore
+    carnivore = Carnivore
+
+    def __init__(self, seed=None, params=None):
         """
         Creates the variables associated with the class
+
+        :param seed: int (root of the random streams of the island; fresh
+                     entropy is used if not given)
+        :param params: ParameterSet (the island uses the landscape and
+                       species classes of the set; the shared classes
+                       are used if not given)
         """
 
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.placements = {}
+        self.params = params
+        if params is not None:
+            self.landscape_types = {
+                code: params[landscape.__name__]
+                for code, landscape in self.landscape_types.items()}
+            self.herbivore = params.herbivore
+            self.carnivore = params.carnivore
+
         self.map_str = None
         self.map = None
+        self.landscape_grid = None
+        self.landscape_masks = None
+        self.fodder = None
+        self.coords = None
+        self.neighbour_ptr = None
+        self.neighbour_idx = None
+        self.isolated = None
+        self.active = set()
+        self.year = 0
+
+    def stream(self, cell, phase):
+        """
+        Returns the random stream of a phase in a cell in the current year
 
-    def cycle(self):
+        :param cell: int (cell index, row by row)
+        :param phase: str (one of randomness.phases)
+        :return: randomness.Stream
         """
-        Conducts one cycle on the island
+
+        return randomness.stream(self.seed_sequence, self.year, cell, phase)
+
+    def active_cells(self):
         """
+        Returns the indices and landscapes of the active cells, in
+        row-by-row order
 
-        for row in self.map:
-            for cell in row:
+        :return: list
+        """
 
-                cell.regenerate()
-                cell.fitness_sort()
-                cell.eat_request_herb()
-                cell.eat_request_carn()
-                cell.update_fitness()
-                cell.reproduction()
+        cells = self.map.ravel()
+        return [(index, cells[index]) for index in sorted(self.active)]
 
-        self.migrate_island()
+    def start_of_year(self):
+        """
+        Rebuilds the set of active cells, so cells populated directly with
+        Landscape.populate_cell are visited as well, and forgets the
+        placement streams of the last year
+        """
 
-        for row in self.map:
-            for cell in row:
+        self.refresh_active()
+        self.placements = {}
+
+    def fitness_sort(self):
+        """
+        Sorts the animals of each active cell by descending fitness
+        """
+
+        for index, cell in self.active_cells():
+            cell.fitness_sort()
+
+    def eat_request_herb(self):
+        """
+        Herbivores eat in each active cell in order of fitness
+        """
+
+        for index, cell in self.active_cells():
+            cell.eat_request_herb()
+
+    def eat_request_carn(self):
+        """
+        Carnivores hunt in each active cell in order of fitness
+        """
+
+        for index, cell in self.active_cells():
+            cell.eat_request_carn(self.stream(index, 'hunting'))
+
+    def update_fitness(self):
+        """
+        Updates fitness for all animals
+        """
+
+        for index, cell in self.active_cells():
+            cell.update_fitness()
 
-                cell.aging()
-                cell.weightloss()
-                cell.update_fitness()
-                cell.death()
+    def reproduction(self):
+        """
+        Animals give birth in each active cell
+        """
+
+        for index, cell in self.active_cells():
+            cell.reproduction(self.stream(index, 'reproduction'))
+
+    def end_of_year(self):
+        """
+        Ages all animals, applies the yearly weightloss, updates fitness and
+        removes dying animals. Cells left without animals become inactive.
+        """
 
-        return self.total_island_population
+        for index, cell in self.active_cells():
+            cell.end_of_year(self.stream(index, 'end_of_year'))
+        self.active = {index for index, cell in self.active_cells()
+                       if cell.is_active}
 
     @staticmethod
     def check_string_map(string_map):
@@ -113,29 +203,73 @@ class Island:
 
     def map_from_string(self, map_str=None):
         """
-        Creates the numpy array map
+        Creates the numpy array map, and the index of cell coordinates
+        used to look up cells by their row-by-row position.
+        The fodder of all cells is kept in the fodder grid, next to a grid
+        of landscape letters.
 
         :param map_str: multi line string
         :return: numpy.ndarray
         """
 
         island_map = self.map_str_manager(map_str)
-        self.map = np.empty(
-            (len(island_map), len(island_map[0])), dtype=object)
-        for x, line in enumerate(island_map):
-            for y, cell in enumerate(line):
-                if cell == 'O':
-                    self.map[x, y] = Ocean()
-                elif cell == 'J':
-                    self.map[x, y] = Jungle()
-                elif cell == 'S':
-                    self.map[x, y] = Savannah()
-                elif cell == 'D':
-                    self.map[x, y] = Desert()
-                elif cell == 'M':
-                    self.map[x, y] = Mountain()
+        shape = (len(island_map), len(island_map[0]))
+        self.map = np.empty(shape, dtype=object)
+        self.landscape_grid = np.array([list(line) for line in island_map])
+        self.landscape_masks = {code: self.landscape_grid == code
+                                for code in self.landscape_types}
+        self.fodder = np.zeros(shape)
+        self.coords = [(x, y) for x in range(shape[0])
+                       for y in range(shape[1])]
+        for x, y in self.coords:
+            self.map[x, y] = self.landscape_types[island_map[x][y]]()
+            self.map[x, y].bind_fodder(self.fodder, (x, y))
+        self.build_adjacency()
+        self.refresh_active()
         return self.map
 
+    def build_adjacency(self):
+        """
+        Compiles the valid migration neighbours of every cell into a
+        compressed index: the neighbours of cell i are the cell indices
+        neighbour_idx[neighbour_ptr[i]:neighbour_ptr[i + 1]].
+        Cells without any valid neighbour are flagged as isolated.
+        """
+
+        n_rows, n_cols = self.map.shape
+        illegal = (Ocean, Mountain)
+        neighbour_ptr = [0]
+        neighbour_idx = []
+        for x, y in self.coords:
+            for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if 0 <= nx < n_rows and 0 <= ny < n_cols and \
+                        not isinstance(self.map[nx, ny], illegal):
+                    neighbour_idx.append(nx * n_cols + ny)
+            neighbour_ptr.append(len(neighbour_idx))
+        self.neighbour_ptr = np.array(neighbour_ptr, dtype=int)
+        self.neighbour_idx = np.array(neighbour_idx, dtype=int)
+        self.isolated = np.diff(self.neighbour_ptr) == 0
+
+    def regenerate(self):
+        """
+        Regenerates fodder on the whole island, with one NumPy expression
+        per landscape type
+        """
+
+        for code, landscape in self.landscape_types.items():
+            mask = self.landscape_masks[code]
+            self.fodder[mask] = landscape.regrow(self.fodder[mask])
+
+    def refresh_active(self):
+        """
+        Rebuilds the set of active cells: the indices of cells holding
+        animals
+        """
+
+        cells = self.map.ravel()
+        self.active = {index for index in range(cells.size)
+                       if cells[index].is_active}
+
     def distribute_animals(self, ini_pop=None):
         """
         Puts Herbivores and Carnivores into their respective cells in map
@@ -185,21 +319,11 @@ class Island:
                                      ' integer.\n2. Animal weight has to be' 
                                      ' a non-negative number(float).')
 
-            cell.populate_cell(dictionary['pop'])
-
-    def get_random_landscapes(self):
-        """
-        Creates a list of randomized landscapes from the numpy array map
-
-        :return: list
-        """
-
-        array_list = self.map.tolist()
-        land_list = [row for col in array_list for row in col]
-
-        random.shuffle(land_list)
-
-        return land_list
+            index = (map_row - 1) * self.map.shape[1] + map_col - 1
+            if index not in self.placements:
+                self.placements[index] = self.stream(index, 'placement')
+            cell.populate_cell(dictionary['pop'], self.placements[index])
+            self.active.add(index)
 
     def get_surrounding_landscapes(self, pos):
         """
@@ -210,43 +334,46 @@ class Island:
         :return: list
         """
 
-        possible_moves = []
         x, y = pos
-        illegal = (Ocean, Mountain)
-        if x + 1 < len(self.map):
-            possible_moves.append(self.map[x + 1, y])
-        if x - 1 >= 0:
-            possible_moves.append(self.map[x - 1, y])
-        if y + 1 < len(self.map[0]):
-            possible_moves.append(self.map[x, y + 1])
-        if y - 1 >= 0:
-            possible_moves.append(self.map[x, y - 1])
-        valid_moves = []
-        for move in possible_moves:
-            if not isinstance(move, illegal):
-                valid_moves.append(move)
-        return valid_moves
+        index = x * self.map.shape[1] + y
+        cells = self.map.ravel()
+        return [cells[i] for i in self.neighbour_idx[
+            self.neighbour_ptr[index]:self.neighbour_ptr[index + 1]]]
 
     def migrate_island(self):
         """
-        Iterates through map and initiates migration for each landscape
+        Iterates through the active landscapes and initiates migration for
+        each of them. Isolated landscapes keep their animals.
+        Landscapes receiving animals become active.
+        The herbivore mass of every landscape animals may move to or from
+        is summed once before any animal moves.
+        Each landscape draws from its own random stream, so landscapes are
+        visited in row-by-row order.
         """
 
-        land_list = self.get_random_landscapes()
-
+        land_list = sorted(self.active)
+        reached = set(land_list)
+        ptr = self.neighbour_ptr
         for land in land_list:
-            coords = np.where(self.map == land)
-            x = coords[0][0]
-            y = coords[1][0]
-            self.map[x, y].migrate(
-                self.get_surrounding_landscapes([x, y]))
+            reached.update(
+                self.neighbour_idx[ptr[land]:ptr[land + 1]].tolist())
+
+        cells = self.map.ravel()
+        for land in reached:
+            if not self.isolated[land]:
+                cells[land].store_herb_mass()
 
         for land in land_list:
-            coords = np.where(self.map == land)
-            x = coords[0][0]
-            y = coords[1][0]
-            self.map[x, y].pop_animals = self.map[x, y].new_pop
-            self.map[x, y].new_pop = [[], []]
+            if not self.isolated[land]:
+                x, y = self.coords[land]
+                self.map[x, y].migrate(
+                    self.get_surrounding_landscapes([x, y]),
+                    self.stream(land, 'migration'))
+
+        for land in reached:
+            if not self.isolated[land]:
+                cells[land].settle_migrants()
+        self.active = {land for land in reached if cells[land].is_active}
 
     def populated_island(self, island_map=None, ini_pop=None):
         """
@@ -302,8 +429,8 @@ class Island:
         :return: tuple
         """
 
-        pop = self.population_distribution
-        herbs = [pop[i][0] for i in range(len(pop))]
-        carns = [pop[i][1] for i in range(len(pop))]
+        cells = self.map.ravel()
+        herbs = [cell.num_herbs for cell in cells]
+        carns = [cell.num_carns for cell in cells]
 
         return sum(herbs), sum(carns)
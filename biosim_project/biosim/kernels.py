@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+
+"""
+Batched numeric kernels for the phases of the annual cycle.
+Each kernel works on arrays holding one value per animal.
+Loops that cannot be vectorized are compiled with Numba when it is
+installed, and run as plain Python otherwise.
+"""
+
+import math
+import numpy as np
+from .randomness import min_block, max_block
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+__author__ = 'Sigve Sorensen', 'Filip Rotnes'
+__email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
+
+_age_tables = {}
+
+
+def jit(function):
+    """
+    Compiles a kernel with Numba if it is installed; otherwise the
+    function is returned unchanged
+
+    :param function: function
+    :return: function
+    """
+
+    if numba is None:
+        return function
+    return numba.njit(cache=True)(function)
+
+
+def age_factor(params, age):
+    """
+    Returns the age sigmoid of the fitness. For whole, non-negative ages
+    the values are looked up in a table computed once for each
+    (phi_age, a_half); other ages are computed directly.
+
+    :param params: dict (species parameters)
+    :param age: float or numpy.ndarray
+    :return: numpy.ndarray
+    """
+
+    age = np.asarray(age)
+    whole = age.astype(np.intp)
+    if age.size and ((whole != age).any() or whole.min() < 0):
+        with np.errstate(over='ignore'):
+            return 1 / (1 + np.exp(params['phi_age'] *
+                                   (age - params['a_half'])))
+    age = whole
+    key = (params['phi_age'], params['a_half'])
+    table = _age_tables.get(key)
+    oldest = int(age.max()) if age.size else 0
+    if table is None or oldest >= table.size:
+        size = max(128, oldest + 1, 0 if table is None else 2 * table.size)
+        with np.errstate(over='ignore'):
+            table = 1 / (1 + np.exp(params['phi_age'] *
+                                    (np.arange(size) - params['a_half'])))
+        _age_tables[key] = table
+    return table[age]
+
+
+def fitness(params, age, weight):
+    """
+    Calculates the fitness of animals of one species
+
+    :param params: dict (species parameters)
+    :param age: float or numpy.ndarray
+    :param weight: float or numpy.ndarray
+    :return: numpy.ndarray
+    """
+
+    with np.errstate(over='ignore'):
+        return age_factor(params, age) / \
+            (1 + np.exp(-params['phi_weight'] *
+                        (np.asarray(weight) - params['w_half'])))
+
+
+def grazing(fodder, rank, appetite):
+    """
+    Calculates the fodder eaten by herbivores grazing in descending order
+    of fitness. The herbivore of rank k eats what is left after the k
+    fitter ones have each eaten their appetite, capped at the appetite.
+
+    :param fodder: float or numpy.ndarray (fodder in each animal's cell)
+    :param rank: numpy.ndarray (0 for the fittest animal in its cell)
+    :param appetite: float (F)
+    :return: numpy.ndarray
+    """
+
+    return np.clip(fodder - rank * appetite, 0, appetite)
+
+
+def births(params, weight, phi, n_same, rng):
+    """
+    Decides which animals give birth, and draws the newborn weights.
+    An animal lighter than zeta * (w_birth + sigma_birth) never gives birth;
+    otherwise the probability is min(1, gamma * phi * (N - 1)).
+
+    :param params: dict (species parameters)
+    :param weight: numpy.ndarray
+    :param phi: numpy.ndarray
+    :param n_same: int or numpy.ndarray (animals of the species in the cell)
+    :param rng: numpy.random.Generator
+    :return: tuple (indices of the parents, newborn weights)
+    """
+
+    p_birth = np.where(
+        weight < params['zeta'] * (params['w_birth'] + params['sigma_birth']),
+        0, np.minimum(1, params['gamma'] * phi * (np.asarray(n_same) - 1)))
+    parents = np.flatnonzero(rng.random(len(weight)) < p_birth)
+    newborn_weight = rng.normal(params['w_birth'], params['sigma_birth'],
+                                parents.size)
+    return parents, newborn_weight
+
+
+def deaths(params, phi, rng):
+    """
+    Decides which animals die, each with probability omega * (1 - phi)
+
+    :param params: dict (species parameters)
+    :param phi: numpy.ndarray
+    :param rng: numpy.random.Generator
+    :return: numpy.ndarray (bool, True for animals that die)
+    """
+
+    return rng.random(len(phi)) < params['omega'] * (1 - np.asarray(phi))
+
+
+@jit
+def _fitness_scalar(age, weight, phi_age, a_half, phi_weight, w_half):
+    """
+    Calculates the fitness of one animal; the exponents are capped so
+    that very old animals get a fitness close to 0 instead of an overflow
+
+    :return: float
+    """
+
+    return 1 / (1 + math.exp(min(phi_age * (age - a_half), 700.))) / \
+        (1 + math.exp(min(-phi_weight * (weight - w_half), 700.)))
+
+
+@jit
+def hunting(cells, herb_bounds, carn_bounds, herb_phi, herb_weight,
+            carn_age, carn_weight, carn_phi, rng, appetite, beta,
+            delta_phi_max, phi_age, a_half, phi_weight, w_half):
+    """
+    Carnivores hunt in the given cells. Animals are sorted by cell and by
+    descending fitness; each carnivore tries the surviving herbivores of
+    its cell from the least fit, and stops once it has eaten its appetite.
+    A herbivore is killed with probability min(1, delta_phi/DeltaPhiMax).
+    Each carnivore's weight and fitness are updated in place after a kill,
+    and the killed herbivores at the least fit end of a cell are skipped by
+    the carnivores after it. Uniform numbers are drawn in blocks as the
+    hunt needs them, starting at min_block numbers and doubling up to
+    max_block.
+
+    :param cells: numpy.ndarray (cells holding both species)
+    :param herb_bounds: numpy.ndarray (first herbivore row of each cell)
+    :param carn_bounds: numpy.ndarray (first carnivore row of each cell)
+    :param rng: numpy.random.Generator
+    :return: numpy.ndarray (bool, True for herbivores that survive)
+    """
+
+    alive = np.ones(herb_phi.size, dtype=np.bool_)
+    draws = np.empty(0)
+    used = 0
+    block = min_block
+    for index in cells:
+        first, last = herb_bounds[index], herb_bounds[index + 1]
+        for carn in range(carn_bounds[index], carn_bounds[index + 1]):
+            while last > first and not alive[last - 1]:
+                last -= 1
+            eaten = 0.
+            for herb in range(last - 1, first - 1, -1):
+                if eaten >= appetite:
+                    break
+                if not alive[herb]:
+                    continue
+                if used == draws.size:
+                    draws = rng.random(block)
+                    used = 0
+                    block = min(2 * block, max_block)
+                draw = draws[used]
+                used += 1
+                delta_phi = carn_phi[carn] - herb_phi[herb]
+                if draw < min(1., delta_phi / delta_phi_max):
+                    carn_weight[carn] += beta * herb_weight[herb]
+                    eaten += herb_weight[herb]
+                    alive[herb] = False
+                    carn_phi[carn] = _fitness_scalar(
+                        carn_age[carn], carn_weight[carn], phi_age, a_half,
+                        phi_weight, w_half)
+    return alive
+
+
+@jit
+def cohort_hunting(cells, herb_bounds, carn_bounds, herb_phi, herb_weight,
+                   herb_count, carn_age, carn_weight, carn_phi, rng,
+                   appetite, beta, delta_phi_max, phi_age, a_half,
+                   phi_weight, w_half):
+    """
+    Carnivores hunt herbivore cohorts in the given cells, in the order of
+    hunting. Within a cohort, the number of herbivores a carnivore passes
+    over before its next kill follows a geometric distribution, drawn by
+    inversion from the same blocks of uniform numbers. The counts of the
+    cohorts are decreased in place.
+
+    :param cells: numpy.ndarray (cells holding both species)
+    :param herb_bounds: numpy.ndarray (first herbivore row of each cell)
+    :param carn_bounds: numpy.ndarray (first carnivore row of each cell)
+    :param herb_count: numpy.ndarray (herbivores in each cohort)
+    :param rng: numpy.random.Generator
+    """
+
+    draws = np.empty(0)
+    used = 0
+    block = min_block
+    for index in cells:
+        first, last = herb_bounds[index], herb_bounds[index + 1]
+        for carn in range(carn_bounds[index], carn_bounds[index + 1]):
+            while last > first and herb_count[last - 1] == 0:
+                last -= 1
+            eaten = 0.
+            for herb in range(last - 1, first - 1, -1):
+                if eaten >= appetite:
+                    break
+                trials = herb_count[herb]
+                while trials > 0 and eaten < appetite:
+                    p_kill = min(1., (carn_phi[carn] - herb_phi[herb]) /
+                                 delta_phi_max)
+                    if p_kill <= 0.:
+                        break
+                    passed = 0
+                    if p_kill < 1.:
+                        if used == draws.size:
+                            draws = rng.random(block)
+                            used = 0
+                            block = min(2 * block, max_block)
+                        skip = math.log(1. - draws[used]) / \
+                            math.log(1. - p_kill)
+                        used += 1
+                        if skip >= trials:
+                            break
+                        passed = int(skip)
+                    trials -= passed + 1
+                    herb_count[herb] -= 1
+                    carn_weight[carn] += beta * herb_weight[herb]
+                    eaten += herb_weight[herb]
+                    carn_phi[carn] = _fitness_scalar(
+                        carn_age[carn], carn_weight[carn], phi_age, a_half,
+                        phi_weight, w_half)
@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 
 from .animals import *
+from . import kernels, randomness
+import numpy as np
+from operator import attrgetter
+from itertools import compress
 
 __author__ = 'Sigve Sorensen', 'Filip Rotnes'
 __email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
@@ -12,6 +16,8 @@ class Landscape:
     """
 
     default_params = {'f_max': 0}
+    herbivore = Herbivore
+    carnivore = Carnivore
 
     @classmethod
     def set_parameters(cls, new_params=default_params):
@@ -23,11 +29,10 @@ class Landscape:
         """
 
         for key in new_params:
-            if key not in 'f_max':
+            if key not in cls.default_params:
                 raise KeyError('Invalid parameter name: ' + key)
 
-            if key in new_params:
-                cls.default_params[key] = new_params[key]
+            cls.default_params[key] = new_params[key]
 
     @classmethod
     def get_params(cls):
@@ -45,25 +50,54 @@ class Landscape:
         Creates the variables associated with the class
         """
 
+        self._fodder = np.zeros((1, 1))
+        self._loc = (0, 0)
         self.f = self.default_params['f_max']
         self.pop_animals = [[], []]
         self.new_pop = [[], []]
+        self._herb_mass = None
 
-    def populate_cell(self, population=None):
+    @property
+    def f(self):
+        """
+        Fodder in the landscape, stored in a fodder grid
+
+        :return: float
+        """
+
+        return float(self._fodder[self._loc])
+
+    @f.setter
+    def f(self, value):
+        self._fodder[self._loc] = value
+
+    def bind_fodder(self, fodder, loc):
+        """
+        Moves the fodder of the landscape into an island's fodder grid
+
+        :param fodder: numpy.ndarray (fodder grid)
+        :param loc: tuple (position of the landscape in the grid)
+        """
+
+        fodder[loc] = self.f
+        self._fodder, self._loc = fodder, loc
+
+    def populate_cell(self, population=None, rng=None):
         """
         Populates the cell with respective animals
 
         :param population: dict
+        :param rng: randomness.Stream (for the weights of the animals)
         """
 
         for animal in population:
 
             if animal['species'] == 'Herbivore':
-                self.pop_animals[0].append(Herbivore(weight=animal['weight'],
-                                                     age=animal['age']))
+                self.pop_animals[0].append(self.herbivore(
+                    weight=animal['weight'], age=animal['age'], rng=rng))
             elif animal['species'] == 'Carnivore':
-                self.pop_animals[1].append(Carnivore(weight=animal['weight'],
-                                                     age=animal['age']))
+                self.pop_animals[1].append(self.carnivore(
+                    weight=animal['weight'], age=animal['age'], rng=rng))
 
     @property
     def num_herbs(self):
@@ -81,14 +115,37 @@ class Landscape:
 
         return len(self.pop_animals[1])
 
+    @property
+    def is_active(self):
+        """
+        Returns whether the landscape has animals
+
+        :return: bool
+        """
+
+        return bool(self.pop_animals[0] or self.pop_animals[1])
+
     @property
     def sum_herb_mass(self):
         """
         Return the sum of Herbivore weights in the landscape
+        During migration the sum stored by store_herb_mass is returned, as
+        no weights change while animals move.
         """
 
+        if self._herb_mass is not None:
+            return self._herb_mass
         return sum([herb.weight for herb in self.pop_animals[0]])
 
+    def store_herb_mass(self):
+        """
+        Stores the sum of Herbivore weights until settle_migrants is
+        called, so that neighbours computing their migration propensities
+        read it without summing the herbivores again
+        """
+
+        self._herb_mass = sum([herb.weight for herb in self.pop_animals[0]])
+
     def aging(self):
         """
         Age all animals in landscape with one cycle
@@ -98,33 +155,79 @@ class Landscape:
             for animal in species:
                 animal.ages()
 
-    def death(self):
+    def death(self, rng=None):
         """
         Removes dying animals
-        """
-
-        def survivors(pop):
-            return [animal for animal in pop if not animal.dies()]
-
-        self.pop_animals[0] = survivors(self.pop_animals[0])
-        self.pop_animals[1] = survivors(self.pop_animals[1])
-
-    def reproduction(self):
+        Deaths are drawn in one batch per species, and the population list
+        is only rewritten when an animal dies
+
+        :param rng: randomness.Stream (the default stream if not given)
+        """
+
+        rng = rng or randomness.default
+        for index, species in enumerate(self.pop_animals):
+            if not species:
+                continue
+            dead = kernels.deaths(species[0].default_params,
+                                  [animal.phi for animal in species],
+                                  rng.generator)
+            if dead.any():
+                species[:] = list(compress(species, ~dead))
+
+    def end_of_year(self, rng=None):
+        """
+        Ages all animals, applies the yearly weightloss, updates fitness and
+        removes dying animals, in one pass over each species.
+        Gives the same result as aging, weightloss, update_fitness and
+        death called in turn, for the same random draws.
+
+        :param rng: randomness.Stream (the default stream if not given)
+        """
+
+        rng = rng or randomness.default
+        for index, species in enumerate(self.pop_animals):
+            if not species:
+                continue
+            params = species[0].default_params
+            ages = np.array([animal.age for animal in species]) + 1
+            weights = np.array([animal.weight for animal in species])
+            weights -= params['eta'] * weights
+            phis = kernels.fitness(params, ages, weights)
+            dead = kernels.deaths(params, phis, rng.generator)
+            for animal, age, weight, phi in zip(species, ages.tolist(),
+                                                weights.tolist(),
+                                                phis.tolist()):
+                animal.age, animal.weight, animal.phi = age, weight, phi
+            if dead.any():
+                species[:] = list(compress(species, ~dead))
+
+    def reproduction(self, rng=None):
         """
         For each Animal reproducing, adds one newborn
-        """
-
-        for species in self.pop_animals:
-            newborn_animals = []
-            for animal in species:
-                if animal.birth(len(species)):
-                    if isinstance(animal, Herbivore):
-                        newborn_animals.append(Herbivore())
-                    elif isinstance(animal, Carnivore):
-                        newborn_animals.append(Carnivore())
-                    animal.weight -= newborn_animals[-1].weight * \
-                        animal.default_params['xi']
-            species.extend(newborn_animals)
+        Birth decisions and newborn weights are drawn in one batch per species
+
+        :param rng: randomness.Stream (the default stream if not given)
+        """
+
+        rng = rng or randomness.default
+        for index, species in enumerate(self.pop_animals):
+            if len(species) < 2:
+                continue
+            kind = type(species[0])
+            params = kind.default_params
+            parents, newborn_weight = kernels.births(
+                params, np.array([animal.weight for animal in species]),
+                np.array([animal.phi for animal in species]), len(species),
+                rng.generator)
+            if not parents.size:
+                continue
+            for parent, loss in zip(parents.tolist(),
+                                    (params['xi'] * newborn_weight).tolist()):
+                species[parent].weight -= loss
+            newborn_phi = kernels.fitness(params, 0, newborn_weight)
+            species.extend(kind.from_state(weight, 0, phi) for weight, phi
+                           in zip(newborn_weight.tolist(),
+                                  newborn_phi.tolist()))
 
     def weightloss(self):
         """
@@ -137,67 +240,99 @@ class Landscape:
 
     def update_fitness(self):
         """
-        Updates fitness for all animals
+        Updates fitness for all animals whose weight or age has changed,
+        one batched evaluation per species
         """
 
         for species in self.pop_animals:
-            for animal in species:
-                animal.fitness()
+            outdated = [animal for animal in species if animal.phi_outdated]
+            if not outdated:
+                continue
+            phis = kernels.fitness(outdated[0].default_params,
+                                   [animal.age for animal in outdated],
+                                   [animal.weight for animal in outdated])
+            for animal, phi in zip(outdated, phis.tolist()):
+                animal.phi = phi
 
     def fitness_sort(self):
         """
-        Sorts animals in landscape by their respective fitness
+        Sorts animals in landscape by their respective fitness, descending.
+        The sort is stable, and runs in close to linear time when the
+        order left from the previous year is nearly sorted.
         """
 
         for species in self.pop_animals:
-            desc = False
-            while not desc:
-                desc = True
-                for animal in range(len(species) - 1):
-                    if species[animal].phi < species[animal + 1].phi:
-                        species[animal], species[animal + 1] = \
-                            species[animal + 1], species[animal]
-                        desc = False
+            species.sort(key=attrgetter('phi'), reverse=True)
 
     def eat_request_herb(self):
 
         """
         Herbivores eat in the landscape, in order of fitness
         The fittest eats first
+        Only the herbivores that get fodder before it runs out are updated
         """
 
-        for herb in self.pop_animals[0]:
-            request = herb.default_params['F']
-            if request <= self.f:
-                self.f -= request
-            else:
-                request = self.f
-                self.f = 0
-            herb.eating(request)
-            herb.fitness()
+        herbs = self.pop_animals[0]
+        params = self.herbivore.default_params
+        appetite = params['F']
+        if not herbs or appetite <= 0 or self.f <= 0:
+            return
+
+        fed = herbs[:int(np.ceil(self.f / appetite))]
+        eaten = kernels.grazing(self.f, np.arange(len(fed)), appetite)
+        if len(fed) * appetite >= self.f:
+            self.f = 0
+        else:
+            self.f -= len(fed) * appetite
+
+        weights = np.array([herb.weight for herb in fed]) + \
+            params['beta'] * eaten
+        phis = kernels.fitness(params, [herb.age for herb in fed], weights)
+        for herb, weight, phi in zip(fed, weights.tolist(), phis.tolist()):
+            herb.weight = weight
+            herb.phi = phi
 
-    def eat_request_carn(self):
+    def eat_request_carn(self, rng=None):
         """
         Carnivores eat in the landscape, in order of fitness
         The least fit Herbivore gets eaten first
+        Eaten herbivores are removed once, after all carnivores have eaten
+
+        :param rng: randomness.Stream (the default stream if not given)
         """
 
-        carns = self.pop_animals[1]
+        prey = self.pop_animals[0][::-1]
+        alive = [True] * len(prey)
+        n_alive = len(prey)
+        draws = randomness.uniforms(rng or randomness.default)
+
+        for carn in self.pop_animals[1]:
+            if not n_alive:
+                break
+            n_alive -= carn.hunt(prey, alive, draws)
 
-        for carn in carns:
-            self.pop_animals[0] = carn.eating(self.pop_animals[0])
+        if n_alive < len(prey):
+            self.pop_animals[0] = [herb for herb, survived
+                                   in zip(prey, alive) if survived][::-1]
 
     def regenerate(self):
         """
         Regenerates fodder in the landscape, if possible
         """
 
-        if self.f != self.default_params['f_max']:
-            if isinstance(self, Jungle):
-                self.f = self.default_params['f_max']
-            elif isinstance(self, Savannah):
-                self.f += self.default_params['alpha'] * \
-                    (self.default_params['f_max'] - self.f)
+        self.f = self.regrow(self.f)
+
+    @classmethod
+    def regrow(cls, fodder):
+        """
+        Returns the fodder after one year of regrowth. Works on a single
+        value and on arrays of fodder from landscapes of this type.
+
+        :param fodder: float or numpy.ndarray
+        :return: float or numpy.ndarray
+        """
+
+        return fodder
 
     @property
     def abundance_fodder_h(self):
@@ -207,7 +342,8 @@ class Landscape:
         :return: float
         """
 
-        return self.f / ((self.num_herbs + 1) * Herbivore.default_params['F'])
+        return self.f / ((self.num_herbs + 1) *
+                          self.herbivore.default_params['F'])
 
     @property
     def abundance_fodder_c(self):
@@ -217,7 +353,7 @@ class Landscape:
         :return: float
         """
         return self.sum_herb_mass / \
-            ((self.num_carns + 1) * Carnivore.default_params['F'])
+            ((self.num_carns + 1) * self.carnivore.default_params['F'])
 
     def propensity(self, animal, epsilon):
         """
@@ -233,25 +369,49 @@ class Landscape:
         else:
             return e(animal.default_params['lambda'] * epsilon)
 
-    def migrate(self, neighbours):
+    def migrate(self, neighbours, rng=None):
         """
         Migrates animals in landscape
+        Migration decisions and destinations are drawn in one batch per
+        species, and the destination propensities are computed once per
+        species.
+        The current population is kept until settle_migrants is called, so
+        every landscape computes its propensities from the populations
+        before migration, whatever the order landscapes migrate in.
 
         :param neighbours: list (valid neighbours)
-        """
-
-        for species in self.pop_animals:
-            for animal in species:
-                if animal.migrating and animal.is_herbivore:
-                    animal.new_grassland(neighbours).append(animal)
-                elif animal.migrating and animal.is_carnivore:
-                    animal.new_hunting_land(neighbours).append(animal)
-                else:
-                    if animal.is_herbivore:
-                        self.new_pop[0].append(animal)
-                    elif animal.is_carnivore:
-                        self.new_pop[1].append(animal)
-        self.pop_animals = [[], []]
+        :param rng: randomness.Stream (the default stream if not given)
+        """
+
+        rng = rng or randomness.default
+        for index, species in enumerate(self.pop_animals):
+            if not species:
+                continue
+            kind = type(species[0])
+            moving = rng.generator.random(len(species)) < \
+                kind.default_params['mu'] * \
+                np.array([animal.phi for animal in species])
+            picks = []
+            if moving.any():
+                cum_props = np.array(kind.cumulative_propensities(neighbours))
+                picks = np.searchsorted(
+                    cum_props,
+                    rng.generator.random(moving.sum()) * cum_props[-1],
+                    side='right').tolist()
+            picks = iter(picks)
+            for animal, moves in zip(species, moving.tolist()):
+                destination = neighbours[next(picks)] if moves else self
+                destination.new_pop[index].append(animal)
+
+    def settle_migrants(self):
+        """
+        Makes the animals that stayed in or moved to the landscape during
+        migration its new population
+        """
+
+        self.pop_animals = self.new_pop
+        self.new_pop = [[], []]
+        self._herb_mass = None
 
 
 class Jungle(Landscape):
@@ -259,12 +419,35 @@ class Jungle(Landscape):
 
     default_params = {'f_max': 800.0}
 
+    @classmethod
+    def regrow(cls, fodder):
+        """
+        Jungle is restored to f_max every year
+
+        :param fodder: float or numpy.ndarray
+        :return: float
+        """
+
+        return cls.default_params['f_max']
+
 
 class Savannah(Landscape):
     """Savannah. Underclass of superclass Landscape."""
 
     default_params = {'f_max': 300.0, 'alpha': 0.3}
 
+    @classmethod
+    def regrow(cls, fodder):
+        """
+        Savannah regrows a fraction alpha of what is missing up to f_max
+
+        :param fodder: float or numpy.ndarray
+        :return: float or numpy.ndarray
+        """
+
+        return fodder + cls.default_params['alpha'] * \
+            (cls.default_params['f_max'] - fodder)
+
 
 class Desert(Landscape):
     """Desert. Underclass of superclass Landscape."""
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+"""
+Parameter sets for single simulations.
+
+The default_params of the species and landscape classes are shared by
+everything in the interpreter. A ParameterSet derives its own subclass of
+each of them, starting from a copy of the class defaults, so simulations
+given different sets do not see each other's parameters.
+"""
+
+from .landscape import *
+
+__author__ = 'Sigve Sorensen', 'Filip Rotnes'
+__email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
+
+
+class ParameterSet:
+    """
+    This class holds the species and landscape parameters of one
+    simulation, as subclasses of Herbivore, Carnivore and the landscapes
+    with their own default_params. Landscapes of the set create animals of
+    the set's species.
+    """
+
+    species_classes = (Herbivore, Carnivore)
+    landscape_classes = (Jungle, Savannah, Desert, Ocean, Mountain)
+
+    def __init__(self, params=None):
+        """
+        Creates the variables associated with the class
+
+        :param params: dict (class name: dict of parameters), for instance
+                       {'Herbivore': {'beta': 0.8},
+                        'Savannah': {'alpha': 0.2}}
+        """
+
+        self.classes = {}
+        for base in self.species_classes:
+            self.classes[base.__name__] = type(
+                base.__name__, (base,),
+                {'__slots__': (), '__module__': base.__module__,
+                 'default_params': dict(base.default_params)})
+        for base in self.landscape_classes:
+            self.classes[base.__name__] = type(
+                base.__name__, (base,),
+                {'__module__': base.__module__,
+                 'default_params': dict(base.default_params),
+                 'herbivore': self.herbivore, 'carnivore': self.carnivore})
+        if params is not None:
+            self.update(params)
+
+    def __getitem__(self, name):
+        """
+        Returns the class of the set with the given name
+
+        :param name: str (for instance 'Herbivore' or 'Jungle')
+        :return: class
+        """
+
+        return self.classes[name]
+
+    @property
+    def herbivore(self):
+        """
+        :return: class (the set's Herbivore)
+        """
+
+        return self.classes['Herbivore']
+
+    @property
+    def carnivore(self):
+        """
+        :return: class (the set's Carnivore)
+        """
+
+        return self.classes['Carnivore']
+
+    def update(self, params):
+        """
+        Sets parameters of the set's classes. Values that differ from the
+        current ones are validated by the set_parameters of the class, so
+        the output of as_dict can always be given back.
+
+        :param params: dict (class name: dict of parameters)
+        """
+
+        for name, values in params.items():
+            if name not in self.classes:
+                raise KeyError('Invalid parameter class: ' + str(name))
+            cls = self.classes[name]
+            changed = {key: value for key, value in values.items()
+                       if key not in cls.default_params or
+                       cls.default_params[key] != value}
+            cls.set_parameters(changed)
+
+    def as_dict(self):
+        """
+        Returns a copy of all parameters of the set
+
+        :return: dict (class name: dict of parameters)
+        """
+
+        return {name: dict(cls.default_params)
+                for name, cls in self.classes.items()}
+
+    def __reduce__(self):
+        return type(self), (self.as_dict(),)
@@ -0,0 +1,492 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from .animals import *
+from . import kernels
+
+__author__ = 'Sigve Sorensen', 'Filip Rotnes'
+__email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
+
+
+class AnimalArrays:
+    """
+    This class stores one species as contiguous arrays of weight, age,
+    fitness and cell index, one row per animal
+    """
+
+    _columns = ('_weight', '_age', '_phi', '_cell')
+    compaction_threshold = 0.1
+
+    def __init__(self, species, capacity=16):
+        """
+        Creates the variables associated with the class
+
+        :param species: class (Herbivore or Carnivore)
+        :param capacity: int (initial number of allocated rows)
+        """
+
+        self.species = species
+        self.n = 0
+        self._weight = np.empty(capacity)
+        self._age = np.empty(capacity, dtype=int)
+        self._phi = np.empty(capacity)
+        self._cell = np.zeros(capacity, dtype=int)
+
+    @classmethod
+    def from_animals(cls, species, animals, cell=0):
+        """
+        Creates an array store holding copies of the given animals
+
+        :param species: class (Herbivore or Carnivore)
+        :param animals: list
+        :param cell: int (cell index given to every animal)
+        :return: AnimalArrays
+        """
+
+        store = cls(species, capacity=max(16, len(animals)))
+        store.extend([animal.weight for animal in animals],
+                     [animal.age for animal in animals],
+                     [animal.phi for animal in animals], cell)
+        return store
+
+    def to_animals(self):
+        """
+        Creates one animal object for each row in the store
+
+        :return: list
+        """
+
+        return [self.species.from_state(weight, age, phi)
+                for weight, age, phi in zip(self.weight.tolist(),
+                                            self.age.tolist(),
+                                            self.phi.tolist())]
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def n_animals(self):
+        """
+        Number of stored animals
+
+        :return: int
+        """
+
+        return self.n
+
+    def cell_counts(self, n_cells):
+        """
+        Returns the number of animals in each cell
+
+        :param n_cells: int
+        :return: numpy.ndarray
+        """
+
+        return np.bincount(self.cell, minlength=n_cells)
+
+    def cell_mass(self, n_cells):
+        """
+        Returns the sum of the animal weights in each cell
+
+        :param n_cells: int
+        :return: numpy.ndarray
+        """
+
+        return np.bincount(self.cell, self.weight, minlength=n_cells)
+
+    def __getitem__(self, index):
+        """
+        Returns an Animal view of one row in the store
+
+        :param index: int
+        :return: AnimalView
+        """
+
+        if index < 0:
+            index += self.n
+        if not 0 <= index < self.n:
+            raise IndexError('Animal index out of range')
+        return view_class(self.species)(self, index)
+
+    def __iter__(self):
+        for index in range(self.n):
+            yield self[index]
+
+    @property
+    def weight(self):
+        """
+        Weights of the stored animals
+
+        :return: numpy.ndarray
+        """
+
+        return self._weight[:self.n]
+
+    @property
+    def age(self):
+        """
+        Ages of the stored animals
+
+        :return: numpy.ndarray
+        """
+
+        return self._age[:self.n]
+
+    @property
+    def phi(self):
+        """
+        Fitness of the stored animals
+
+        :return: numpy.ndarray
+        """
+
+        return self._phi[:self.n]
+
+    @property
+    def cell(self):
+        """
+        Cell indices of the stored animals
+
+        :return: numpy.ndarray
+        """
+
+        return self._cell[:self.n]
+
+    def _reserve(self, n_new):
+        """
+        Makes room for n_new more rows, doubling the capacity when needed
+
+        :param n_new: int
+        """
+
+        needed = self.n + n_new
+        if needed <= len(self._weight):
+            return
+        capacity = max(needed, 2 * len(self._weight))
+        for name in self._columns:
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+
+    def append(self, weight, age, phi, cell=0):
+        """
+        Adds one animal to the store
+
+        :param weight: float
+        :param age: int
+        :param phi: float
+        :param cell: int
+        """
+
+        self._reserve(1)
+        self._weight[self.n] = weight
+        self._age[self.n] = age
+        self._phi[self.n] = phi
+        self._cell[self.n] = cell
+        self.n += 1
+
+    def extend(self, weights, ages, phis, cells=0):
+        """
+        Adds several animals to the store in one operation
+
+        :param weights: array_like
+        :param ages: array_like
+        :param phis: array_like
+        :param cells: array_like or int
+        """
+
+        n_new = len(weights)
+        self._reserve(n_new)
+        end = self.n + n_new
+        self._weight[self.n:end] = weights
+        self._age[self.n:end] = ages
+        self._phi[self.n:end] = phis
+        self._cell[self.n:end] = cells
+        self.n = end
+
+    def keep(self, mask):
+        """
+        Keeps only the rows where mask is True, preserving their order
+
+        :param mask: numpy.ndarray (bool)
+        """
+
+        kept = int(np.count_nonzero(mask))
+        for name in self._columns:
+            column = getattr(self, name)
+            column[:kept] = column[:self.n][mask]
+        self.n = kept
+
+    def discard(self, dead):
+        """
+        Removes the rows where dead is True. When only a small fraction
+        dies, the holes are filled with surviving rows from the end of the
+        store; the full order-preserving compaction runs only when the dead
+        fraction exceeds compaction_threshold.
+
+        :param dead: numpy.ndarray (bool)
+        """
+
+        n_dead = int(np.count_nonzero(dead))
+        if not n_dead:
+            return
+        if n_dead > self.compaction_threshold * self.n:
+            self.keep(~dead)
+            return
+        kept = self.n - n_dead
+        holes = np.flatnonzero(dead[:kept])
+        movers = kept + np.flatnonzero(~dead[kept:])
+        for name in self._columns:
+            column = getattr(self, name)
+            column[holes] = column[movers]
+        self.n = kept
+
+    def reorder(self, order):
+        """
+        Rearranges the rows of the store
+
+        :param order: numpy.ndarray (row indices)
+        """
+
+        for name in self._columns:
+            column = getattr(self, name)
+            column[:self.n] = column[:self.n][order]
+
+
+class CohortArrays(AnimalArrays):
+    """
+    This class stores one species as cohorts: each row holds a number of
+    animals of the same weight, age and fitness in the same cell
+    """
+
+    _columns = AnimalArrays._columns + ('_count',)
+
+    def __init__(self, species, capacity=16):
+        """
+        Creates the variables associated with the class
+
+        :param species: class (Herbivore or Carnivore)
+        :param capacity: int (initial number of allocated rows)
+        """
+
+        AnimalArrays.__init__(self, species, capacity)
+        self._count = np.zeros(capacity, dtype=int)
+
+    @property
+    def count(self):
+        """
+        Number of animals in each cohort
+
+        :return: numpy.ndarray
+        """
+
+        return self._count[:self.n]
+
+    @property
+    def n_animals(self):
+        """
+        Number of stored animals
+
+        :return: int
+        """
+
+        return int(self.count.sum())
+
+    def cell_counts(self, n_cells):
+        """
+        Returns the number of animals in each cell
+
+        :param n_cells: int
+        :return: numpy.ndarray
+        """
+
+        return np.bincount(self.cell, self.count,
+                           minlength=n_cells).astype(int)
+
+    def cell_mass(self, n_cells):
+        """
+        Returns the sum of the animal weights in each cell
+
+        :param n_cells: int
+        :return: numpy.ndarray
+        """
+
+        return np.bincount(self.cell, self.weight * self.count,
+                           minlength=n_cells)
+
+    def to_animals(self):
+        """
+        Creates one animal object for each animal in the cohorts
+
+        :return: list
+        """
+
+        return [self.species.from_state(weight, age, phi)
+                for weight, age, phi, count in zip(self.weight.tolist(),
+                                                   self.age.tolist(),
+                                                   self.phi.tolist(),
+                                                   self.count.tolist())
+                for _ in range(count)]
+
+    def append(self, weight, age, phi, cell=0, count=1):
+        """
+        Adds one cohort to the store
+
+        :param weight: float
+        :param age: int
+        :param phi: float
+        :param cell: int
+        :param count: int
+        """
+
+        self._reserve(1)
+        self._count[self.n] = count
+        AnimalArrays.append(self, weight, age, phi, cell)
+
+    def extend(self, weights, ages, phis, cells=0, counts=1):
+        """
+        Adds several cohorts to the store in one operation
+
+        :param weights: array_like
+        :param ages: array_like
+        :param phis: array_like
+        :param cells: array_like or int
+        :param counts: array_like or int
+        """
+
+        self._reserve(len(weights))
+        self._count[self.n:self.n + len(weights)] = counts
+        AnimalArrays.extend(self, weights, ages, phis, cells)
+
+    def gather(self, source, counts):
+        """
+        Rebuilds the store from copies of the rows given by source, in that
+        order, with new counts. Used to split cohorts whose animals no
+        longer share the same state.
+
+        :param source: numpy.ndarray (row indices, may repeat)
+        :param counts: numpy.ndarray (count of each new row)
+        """
+
+        self._reserve(source.size - self.n)
+        for name in self._columns:
+            column = getattr(self, name)
+            column[:source.size] = column[:self.n][source]
+        self.n = source.size
+        self.count[:] = counts
+
+    def merge(self, bin_width):
+        """
+        Joins the cohorts of the same cell and age whose weights fall in
+        the same bin of width bin_width into one cohort with their mean
+        weight, and drops empty cohorts. The fitness is recomputed.
+
+        :param bin_width: float (kg)
+        """
+
+        self.keep(self.count > 0)
+        if not self.n:
+            return
+        bins = np.floor(self.weight / bin_width).astype(np.int64)
+        order = np.lexsort((bins, self.age, self.cell))
+        cell, age, bins = self.cell[order], self.age[order], bins[order]
+        first = np.ones(self.n, dtype=bool)
+        first[1:] = ((cell[1:] != cell[:-1]) | (age[1:] != age[:-1]) |
+                     (bins[1:] != bins[:-1]))
+        group = np.cumsum(first) - 1
+        count = self.count[order]
+        mass = np.bincount(group, self.weight[order] * count)
+        count = np.bincount(group, count).astype(int)
+        starts = np.flatnonzero(first)
+        self.n = starts.size
+        self.cell[:] = cell[starts]
+        self.age[:] = age[starts]
+        self.count[:] = count
+        self.weight[:] = mass / count
+        self.phi[:] = kernels.fitness(self.species.default_params, self.age,
+                                      self.weight)
+
+
+class AnimalView:
+    """
+    Exposes one row of an AnimalArrays through the Animal interface.
+    Weight, age and fitness are read from and written to the arrays.
+    The fitness of the row is recomputed whenever its weight or age is
+    set, so it is never outdated.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, store, index):
+        """
+        :param store: AnimalArrays
+        :param index: int
+        """
+
+        self._store = store
+        self._index = index
+
+    @property
+    def weight(self):
+        return float(self._store.weight[self._index])
+
+    @weight.setter
+    def weight(self, value):
+        self._store.weight[self._index] = value
+        self.fitness()
+
+    @property
+    def age(self):
+        return int(self._store.age[self._index])
+
+    @age.setter
+    def age(self, value):
+        self._store.age[self._index] = value
+        self.fitness()
+
+    @property
+    def phi(self):
+        return float(self._store.phi[self._index])
+
+    @phi.setter
+    def phi(self, value):
+        self._store.phi[self._index] = value
+
+    @property
+    def phi_outdated(self):
+        return False
+
+
+class HerbivoreView(AnimalView, Herbivore):
+    """Herbivore stored in an AnimalArrays row"""
+
+    __slots__ = ('_store', '_index')
+
+
+class CarnivoreView(AnimalView, Carnivore):
+    """Carnivore stored in an AnimalArrays row"""
+
+    __slots__ = ('_store', '_index')
+
+
+Herbivore.view_class = HerbivoreView
+Carnivore.view_class = CarnivoreView
+
+
+def view_class(species):
+    """
+    Returns the view class exposing rows of a species, creating it for
+    species classes derived from Herbivore or Carnivore. The view class is
+    kept on the species class, so it goes away together with it.
+
+    :param species: class
+    :return: class
+    """
+
+    if 'view_class' not in species.__dict__:
+        species.view_class = type(
+            species.__name__ + 'View', (AnimalView, species),
+            {'__slots__': ('_store', '_index'),
+             '__module__': species.__module__})
+    return species.view_class
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+"""
+Random number streams for the object engine.
+
+Every island derives its streams from its own SeedSequence, so islands in
+one process never draw from each other's streams. Each phase of the
+annual cycle draws, in each cell, from its own stream keyed by
+(year, cell, phase), so the draws do not depend on the order in which
+cells are visited. The island hands the stream of a phase to the landscape
+running it, which passes it on to its animals.
+
+Phases draw the numbers they need as arrays from the generator of the
+stream. Hunting carnivores, which cannot know in advance how many numbers
+they need, take them from uniforms(), which draws them in blocks. Blocks
+start at min_block numbers and double on each refill up to max_block, so
+phases drawing a few numbers stay cheap and long phases refill rarely.
+
+A stream only keeps its key until it is first used, so the streams of
+phases with nothing to draw cost no more than a small object.
+
+Animals and landscapes used on their own, outside an island, draw from
+the default stream, which seed() restarts.
+"""
+
+import numpy as np
+
+__author__ = 'Sigve Sorensen', 'Filip Rotnes'
+__email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
+
+phases = ('hunting', 'reproduction', 'migration', 'end_of_year',
+          'placement')
+min_block = 64
+max_block = 65536
+
+
+class Stream:
+    """
+    This class hands out random numbers from one generator, which is only
+    seeded and created once it is used
+    """
+
+    __slots__ = ('entropy', 'spawn_key', '_generator')
+
+    def __init__(self, entropy=None, spawn_key=()):
+        """
+        Creates the variables associated with the class
+
+        :param entropy: int (fresh entropy if None)
+        :param spawn_key: tuple (of ints)
+        """
+
+        self.entropy = entropy
+        self.spawn_key = spawn_key
+        self._generator = None
+
+    @property
+    def generator(self):
+        """
+        Generator of the stream, for batched draws
+
+        :return: numpy.random.Generator
+        """
+
+        if self._generator is None:
+            self._generator = np.random.Generator(np.random.PCG64(
+                np.random.SeedSequence(self.entropy,
+                                       spawn_key=self.spawn_key)))
+        return self._generator
+
+
+def uniforms(stream):
+    """
+    Yields uniform numbers in [0, 1) from the generator of a stream, drawn
+    in blocks of min_block numbers doubling up to max_block. The generator
+    is only used once the first number is taken.
+
+    :param stream: Stream
+    :return: iterator (of floats)
+    """
+
+    size = min_block
+    while True:
+        yield from stream.generator.random(size).tolist()
+        size = min(2 * size, max_block)
+
+
+def stream(root, year, cell, phase):
+    """
+    Returns the stream of one phase in one cell in one year
+
+    :param root: numpy.random.SeedSequence (of the island)
+    :param year: int
+    :param cell: int (cell index, row by row)
+    :param phase: str (one of phases)
+    :return: Stream
+    """
+
+    key = (year, cell, phases.index(phase))
+    return Stream(root.entropy, root.spawn_key + key)
+
+
+default = Stream()
+
+
+def seed(seed=None):
+    """
+    Restarts the default stream from a new seed
+
+    :param seed: int
+    """
+
+    global default
+    default = Stream(seed)
@@ -3,11 +3,12 @@
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 from .island import *
+from .parameters import ParameterSet
+from . import backends
 import pandas as pd
 from .animals import *
 import os
 from subprocess import call
-from mpl_toolkits.axes_grid.anchored_artists import AnchoredText
 
 __author__ = 'Sigve Sorensen', 'Filip Rotnes'
 __email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
@@ -25,19 +26,35 @@ class BioSim:
 
     version = '1.0'
 
-    def __init__(self, island_map, ini_pop, seed):
+    engines = backends.registry
+
+    def __init__(self, island_map, ini_pop, seed, engine='reference',
+                 params=None):
         """
         Creates the variables associated with the class
 
         :param island_map: multi line string
         :param ini_pop: initial population in simulation
         :param seed: random seed
+        :param engine: str or class (name of a registered backend, such
+                       as 'reference' for one object per animal or
+                       'vectorized' for whole-island arrays, or an island
+                       class fulfilling the backend interface)
+        :param params: ParameterSet or dict (class name: dict of
+                       parameters, applied on top of the class defaults);
+                       the simulation keeps its own parameters, so
+                       simulations in one interpreter do not share them
         """
 
-        random.seed(seed)
+        island_class = backends.get_backend(engine)
+
         self.year = 0
         self.ini_pop = ini_pop
-        self.island = Island()
+        self.engine = engine
+        if not isinstance(params, ParameterSet):
+            params = ParameterSet(params)
+        self.params = params
+        self.island = island_class(seed=seed, params=params)
         self.island.populated_island(island_map, ini_pop)
         n_rows, n_cols = len(self.island.map_str), len(self.island.map[0])
         self.herb_list = [self.island.total_island_population[0]]
@@ -214,17 +231,20 @@ class BioSim:
         #self.ax_map.add_artist(at)
         box = self.ax_map.get_position()
         #plt.figlegend(('Ocean', 'Desert'), (patches.Patch(color='b'), patches.Patch(color='g')), loc=1)
-        desert_patch = mpatches.Patch(color=(1., 1., 0.5), label='Desert')
-        jungle_patch = mpatches.Patch(color=(0., 0.6, 0.), label='Jungle')
-        mountain_patch = mpatches.Patch(color=(0.5, 0.5, 0.5), label='Mountain')
-        ocean_patch = mpatches.Patch(color=(0., 0., 1.), label='Ocean')
-        savannah_patch = mpatches.Patch(color=(0.5, 1., 0.5), label='Savannah')
+        desert_patch = patches.Patch(color=(1., 1., 0.5), label='Desert')
+        jungle_patch = patches.Patch(color=(0., 0.6, 0.), label='Jungle')
+        mountain_patch = patches.Patch(color=(0.5, 0.5, 0.5), label='Mountain')
+        ocean_patch = patches.Patch(color=(0., 0., 1.), label='Ocean')
+        savannah_patch = patches.Patch(color=(0.5, 1., 0.5), label='Savannah')
 
         self.ax_map.legend(handles=[ocean_patch, desert_patch, mountain_patch,
                             mountain_patch, jungle_patch,savannah_patch],
                             bbox_to_anchor=(1.5, 1), fontsize=6)
 
     def make_movie(self):
+        """
+        Creates a movie from the saved images
+        """
 
         #call('ffmpeg -i biosim_project/animation/biosim_%05d.png output.gif')
 
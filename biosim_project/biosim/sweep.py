@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+"""
+Runs a scenario over many parameter settings in parallel worker processes.
+
+Parameters are named 'Class.key', for instance 'Herbivore.beta',
+'Carnivore.F' or 'Savannah.alpha'. Each worker task runs one replicate
+with its own parameter set, made from the parameters of the sweep and the
+values of its point, so the points of a worker process do not affect each
+other or the class defaults.
+"""
+
+import csv
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .parameters import ParameterSet
+from .ensemble import run_replicate
+from . import backends
+
+__author__ = 'Sigve Sorensen', 'Filip Rotnes'
+__email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
+
+
+def parameter_grid(values):
+    """
+    Returns every combination of the given parameter values
+
+    :param values: dict (parameter name: list of values)
+    :return: list of dict
+    """
+
+    names = list(values)
+    return [dict(zip(names, point))
+            for point in itertools.product(*(values[name]
+                                              for name in names))]
+
+
+def latin_hypercube(ranges, n_points, seed=None):
+    """
+    Returns n_points parameter settings forming a Latin hypercube: the
+    range of each parameter is split into n_points equal strata, and each
+    stratum is sampled exactly once
+
+    :param ranges: dict (parameter name: (low, high))
+    :param n_points: int
+    :param seed: int
+    :return: list of dict
+    """
+
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, (low, high) in ranges.items():
+        strata = (rng.permutation(n_points) +
+                  rng.random(n_points)) / n_points
+        columns[name] = (low + strata * (high - low)).tolist()
+    return [{name: columns[name][k] for name in ranges}
+            for k in range(n_points)]
+
+
+def point_params(point, params=None):
+    """
+    Returns the parameters of a point, by class, on top of the given ones
+
+    :param point: dict (parameter name: value)
+    :param params: dict (class name: dict of parameters)
+    :return: dict (class name: dict of parameters)
+    """
+
+    merged = {name: dict(values) for name, values in (params or {}).items()}
+    for name, value in point.items():
+        class_name, key = name.split('.')
+        merged.setdefault(class_name, {})[key] = value
+    return merged
+
+
+def run_point(island_map, ini_pop, point, seed, num_years,
+              engine='reference', params=None):
+    """
+    Runs one replicate with the parameters of one point
+
+    :param island_map: multi line string
+    :param ini_pop: list of dictionaries
+    :param point: dict (parameter name: value)
+    :param seed: int
+    :param num_years: int
+    :param engine: str or class (backend)
+    :param params: dict (class name: dict of parameters the point is
+                   applied to)
+    :return: numpy.ndarray (herbivore and carnivore totals per year)
+    """
+
+    return run_replicate(island_map, ini_pop, seed, num_years, engine,
+                         point_params(point, params))
+
+
+class ParameterSweep:
+    """
+    This class runs one replicate for every combination of parameter
+    point and seed in a pool of worker processes, and collects the yearly
+    totals in a tidy table with one row per point, seed and year
+    """
+
+    def __init__(self, island_map, ini_pop, points, seeds,
+                 engine='reference', max_workers=None, mp_context=None,
+                 params=None):
+        """
+        Creates the variables associated with the class
+
+        :param island_map: multi line string
+        :param ini_pop: list of dictionaries
+        :param points: list of dict (parameter name: value), for instance
+                       from parameter_grid or latin_hypercube
+        :param seeds: list
+        :param engine: str or class (backend)
+        :param max_workers: int (worker processes; the number of CPUs
+                            if not given)
+        :param mp_context: multiprocessing context for the pool
+        :param params: ParameterSet or dict (class name: dict of
+                       parameters the points are applied to)
+        """
+
+        backends.get_backend(engine)
+        if not isinstance(params, ParameterSet):
+            params = ParameterSet(params)
+        self.params = params.as_dict()
+        self.island_map = island_map
+        self.ini_pop = ini_pop
+        self.points = [dict(point) for point in points]
+        self.seeds = list(seeds)
+        self.engine = engine
+        self.max_workers = max_workers
+        self.mp_context = mp_context
+        self.parameter_names = sorted({name for point in self.points
+                                       for name in point})
+        self.rows = []
+
+    def simulate(self, num_years):
+        """
+        Runs every point with every seed for num_years years, replacing the
+        rows of any earlier run. Rows are ordered by point, seed and year.
+
+        :param num_years: int
+        """
+
+        results = {}
+        with ProcessPoolExecutor(max_workers=self.max_workers,
+                                 mp_context=self.mp_context) as pool:
+            tasks = {pool.submit(run_point, self.island_map, self.ini_pop,
+                                 point, seed, num_years, self.engine,
+                                 self.params):
+                     (index, seed)
+                     for index, point in enumerate(self.points)
+                     for seed in self.seeds}
+            for future in as_completed(tasks):
+                results[tasks[future]] = future.result()
+
+        self.rows = []
+        for index, point in enumerate(self.points):
+            for seed in self.seeds:
+                for year, (herbs, carns) in enumerate(
+                        results[index, seed].tolist()):
+                    row = {name: point.get(name)
+                           for name in self.parameter_names}
+                    row.update(point=index, seed=seed, year=year,
+                               Herbivores=herbs, Carnivores=carns)
+                    self.rows.append(row)
+
+    @property
+    def columns(self):
+        """
+        Column names of the results table
+
+        :return: list
+        """
+
+        return self.parameter_names + ['point', 'seed', 'year',
+                                       'Herbivores', 'Carnivores']
+
+    def to_frame(self):
+        """
+        Returns the results as a DataFrame
+
+        :return: pandas.DataFrame
+        """
+
+        import pandas as pd
+        return pd.DataFrame(self.rows, columns=self.columns)
+
+    def write_csv(self, path):
+        """
+        Writes the results table to a CSV file
+
+        :param path: str
+        """
+
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=self.columns)
+            writer.writeheader()
+            writer.writerows(self.rows)
@@ -5,6 +5,7 @@ __email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
 
 
 from ..animals import *
+import pickle
 
 
 def test_biocycle_herbivore():
@@ -141,3 +142,76 @@ def test_migrating():
     herb = Herbivore()
     herb.phi = 1
     assert herb.migrating
+
+
+def test_pick_destination():
+    """
+    Tests that a migrating animal never picks a neighbour with
+    zero propensity.
+    """
+
+    for _ in range(100):
+        assert Herbivore.pick_destination([0.0, 0.0, 5.0]) == 2
+        assert Carnivore.pick_destination([1.0, 1.0]) == 0
+
+
+def test_hunt():
+    """
+    Tests that a carnivore that is certain to catch its prey eats the
+    least fit herbivores first, and stops when it has eaten F.
+    """
+
+    Carnivore.set_parameters({'F': 15.0, 'DeltaPhiMax': 0.0000000001})
+    carn = Carnivore()
+    carn.phi = 1
+    prey = [Herbivore(weight=10, age=50) for _ in range(3)]
+    for herb in prey:
+        herb.weight, herb.phi = 10, 0
+    alive = [True, False, True]
+    assert carn.hunt(prey, alive) == 2
+    assert alive == [False, False, False]
+    Carnivore.set_parameters({'F': 50.0})
+
+
+def test_lazy_fitness():
+    """
+    Tests that fitness is only marked outdated after weight or age
+    changes, and is recomputed when read.
+    """
+
+    herb = Herbivore(weight=20, age=5)
+    phi0 = herb.phi
+    assert not herb.phi_outdated
+    herb.weightloss()
+    assert herb.phi_outdated
+    assert herb.phi < phi0
+    assert not herb.phi_outdated
+    herb.phi = 0.5
+    assert herb.phi == 0.5
+
+
+def test_compiled_parameters():
+    """
+    Tests that animals carry no instance dictionary, and that the
+    compiled constants follow parameter changes.
+    """
+
+    herb = Herbivore()
+    assert not hasattr(herb, '__dict__')
+    Herbivore.set_parameters({'zeta': 2.0})
+    p = Herbivore.default_params
+    assert Herbivore._birth_threshold == 2.0 * (p['w_birth'] +
+                                                p['sigma_birth'])
+    Herbivore.default_params['eta'] = 0.5
+    assert Herbivore._eta == 0.5
+    Herbivore.set_parameters({'zeta': 3.5, 'eta': 0.05})
+
+
+def test_params_pickle():
+    """
+    Tests that the class parameters can be pickled, as a plain dict.
+    """
+
+    params = pickle.loads(pickle.dumps(Carnivore.get_params()))
+    assert type(params) is dict
+    assert params == Carnivore.default_params
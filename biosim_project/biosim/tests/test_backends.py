@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Sigve Sorensen', 'Filip Rotnes'
+__email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
+
+from ..backends import *
+from ..parameters import ParameterSet
+import pytest
+
+
+def test_builtin_backends():
+    """
+    Tests that the reference and vectorized backends are registered.
+    """
+
+    assert get_backend('reference') is Island
+    assert get_backend('vectorized') is ArrayIsland
+    assert get_backend('cohort') is CohortIsland
+    assert available_backends() == ['cohort', 'reference', 'vectorized']
+
+
+def test_invalid_backend():
+    """
+    Tests that unknown names and incomplete classes are rejected.
+    """
+
+    class Incomplete:
+        def cycle(self):
+            pass
+
+    with pytest.raises(ValueError):
+        get_backend('unknown')
+    with pytest.raises(TypeError):
+        register_backend('incomplete', Incomplete)
+    with pytest.raises(TypeError):
+        get_backend(Incomplete)
+    assert 'incomplete' not in registry
+
+
+def test_backends_side_by_side():
+    """
+    Tests that every backend can run the same island in one process.
+    """
+
+    island_map = 'OOOO\nOJSO\nOOOO'
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(10)]}]
+    islands = [get_backend(name)() for name in available_backends()]
+    for island in islands:
+        island.populated_island(island_map, ini_pop)
+        assert island.total_island_population == (10, 0)
+    for island in islands:
+        herbs, carns = island.cycle()
+        assert herbs > 0 and carns == 0
+        assert island.population_distribution.sum() == herbs
+
+
+def test_phase_by_phase():
+    """
+    Tests that running the phases in order is one cycle, and that the
+    backends agree after each phase that draws no random numbers.
+    """
+
+    params = ParameterSet({'Herbivore': {'F': 10., 'beta': 0.9},
+                           'Jungle': {'f_max': 800.}})
+    island_map = 'OOOOO\nOJJSO\nOOOOO'
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': w}
+                        for w in range(10, 110, 10)]},
+               {'loc': (2, 4),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(40)]}]
+    for name in available_backends():
+        stepped, cycled = [get_backend(name)(seed=1, params=params)
+                           for _ in range(2)]
+        for island in (stepped, cycled):
+            island.populated_island(island_map, ini_pop)
+        for phase in AnnualCycle.phases:
+            getattr(stepped, phase)()
+        stepped.year += 1
+        assert stepped.total_island_population == cycled.cycle()
+        assert (stepped.population_distribution ==
+                cycled.population_distribution).all()
+
+    islands = [get_backend(name)(params=params)
+               for name in available_backends()]
+    for island in islands:
+        assert isinstance(island, AnnualCycle)
+        island.populated_island(island_map, ini_pop)
+        for phase in ('start_of_year', 'regenerate', 'fitness_sort',
+                      'eat_request_herb', 'update_fitness'):
+            getattr(island, phase)()
+    for island in islands[1:]:
+        assert (island.fodder == islands[0].fodder).all()
+        assert (island.population_distribution ==
+                islands[0].population_distribution).all()
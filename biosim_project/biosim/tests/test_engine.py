@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Sigve Sorensen', 'Filip Rotnes'
+__email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
+
+from ..engine import *
+
+
+def test_absorb_animals():
+    """
+    Tests that animals distributed on the island are moved from the
+    landscape cells into the island arrays.
+    """
+
+    island = ArrayIsland(seed=1)
+    island.populated_island()
+    island.absorb_animals()
+    assert island.herbs.n == 150
+    assert island.carns.n == 40
+    assert island.map[9, 9].pop_animals == [[], []]
+    assert island.total_island_population == (150, 40)
+
+
+def test_cycle():
+    """
+    Tests that cycle method returns a tuple matching the population
+    distribution.
+    """
+
+    island = ArrayIsland(seed=1)
+    island.populated_island()
+    total = island.cycle()
+    assert isinstance(total, tuple)
+    assert total == tuple(island.population_distribution.sum(axis=0))
+
+
+def test_eat_request_herb():
+    """
+    Tests that herbivores eat in order of fitness until the fodder
+    runs out.
+    """
+
+    Herbivore.set_parameters({'F': 10.0, 'beta': 0.9})
+    island = ArrayIsland(seed=1)
+    island.map_from_string("""OOO
+    OJO
+    OOO""")
+    island.herbs.extend([30.0, 20.0, 10.0], [5, 5, 5], [0.9, 0.8, 0.7], 4)
+    island.cell_fodder[4] = 25.0
+    island.eat_request_herb()
+    assert island.cell_fodder[4] == 0
+    assert list(island.herbs.weight) == [39.0, 29.0, 14.5]
+
+
+def test_regenerate():
+    """
+    Tests that Jungle and Savannah regenerate fodder, while Desert does not.
+    """
+
+    island = ArrayIsland(seed=1)
+    island.map_from_string("""OOOOO
+    OJSDO
+    OOOOO""")
+    island.cell_fodder[:] = 0
+    island.regenerate()
+    assert island.cell_fodder[6] == Jungle.default_params['f_max']
+    assert island.cell_fodder[7] > 0
+    assert island.cell_fodder[8] == 0
+
+
+def test_migration():
+    """
+    Tests that an animal migrates to the only valid neighbour cell
+    if it is ready to migrate.
+    """
+
+    Herbivore.set_parameters({'mu': 1})
+    island = ArrayIsland(seed=1)
+    island.map_from_string("""OOOOO
+        OOOOO
+        OJJOO
+        OOOOO
+        OOOOO""")
+    island.herbs.extend([20.0], [5], [1.0], 12)
+    island.migrate_island()
+    assert list(island.herbs.cell) == [11]
+
+
+def test_death():
+    """
+    Tests that animals die when the probability of death is 100%.
+    """
+
+    Herbivore.set_parameters({'omega': 1})
+    island = ArrayIsland(seed=1)
+    island.map_from_string()
+    island.herbs.extend([20.0, 20.0], [5, 5], [0.0, 0.0], 30)
+    island.death()
+    assert island.herbs.n == 0
+
+
+def test_migration_propensity_ratios():
+    """
+    Tests that migrants choose between the neighbours of their cell by
+    propensity even when other cells have far larger propensities.
+    """
+
+    island = ArrayIsland(seed=1)
+    island.map_from_string('OOOOO\nOJSJO\nODJDO\nOJSJO\nOOOOO')
+    island.herbs.extend(np.full(4000, 40.), 5, 1., 12)
+    Herbivore.set_parameters({'mu': 1.0})
+    island.migrate_island()
+    Herbivore.set_parameters({'mu': 0.25})
+    counts = np.bincount(island.herbs.cell, minlength=25)
+    assert counts[11] == counts[13] == 0
+    assert counts[7] > 1000 and counts[17] > 1000
+
+
+def test_cohort_eat_request_herb():
+    """
+    Tests that a herbivore cohort is split into animals eating their full
+    appetite, one eating the rest of the fodder and hungry animals.
+    """
+
+    Herbivore.set_parameters({'F': 10.0, 'beta': 0.9})
+    island = CohortIsland(seed=1)
+    island.map_from_string('OOO\nOJO\nOOO')
+    island.herbs.extend([30.0, 20.0], [5, 5], [0.9, 0.8], 4, [2, 3])
+    island.cell_fodder[4] = 35.0
+    island.eat_request_herb()
+    assert island.cell_fodder[4] == 0
+    assert list(island.herbs.weight) == [39.0, 29.0, 24.5, 20.0]
+    assert list(island.herbs.count) == [2, 1, 1, 1]
+
+
+def test_cohort_cycle():
+    """
+    Tests that a cohort island keeps far fewer rows than animals, and
+    reports the number of animals.
+    """
+
+    Herbivore.set_parameters({'F': 10.0, 'omega': 0.4})
+    island = CohortIsland(seed=1)
+    island.populated_island('OOOO\nOJSO\nOOOO', [
+        {'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5,
+                                 'weight': 20} for _ in range(200)]},
+        {'loc': (2, 3), 'pop': [{'species': 'Carnivore', 'age': 5,
+                                 'weight': 20} for _ in range(2)]}])
+    assert island.total_island_population == (200, 2)
+    assert island.herbs.n < 50
+    for _ in range(5):
+        n_herbs, n_carns = island.cycle()
+    assert n_herbs == island.herbs.count.sum() > island.herbs.n
+    assert island.population_distribution.sum() == n_herbs + n_carns
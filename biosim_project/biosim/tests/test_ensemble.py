@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Sigve Sorensen', 'Filip Rotnes'
+__email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
+
+from ..ensemble import *
+import pytest
+
+
+def test_streaming_quantiles():
+    """
+    Tests that the estimated quantiles are close to the quantiles of all
+    the observations, and exact for fewer than five observations.
+    """
+
+    rng = np.random.default_rng(0)
+    data = rng.normal(100, 10, size=(2000, 3))
+    estimate = StreamingQuantiles((0.1, 0.5, 0.9))
+    for row in data[:3]:
+        estimate.add(row)
+    assert np.allclose(estimate.quantiles,
+                       np.quantile(data[:3], (0.1, 0.5, 0.9), axis=0))
+    for row in data[3:]:
+        estimate.add(row)
+    assert np.allclose(estimate.quantiles,
+                       np.quantile(data, (0.1, 0.5, 0.9), axis=0), atol=1.5)
+
+
+def test_ensemble():
+    """
+    Tests that an ensemble run in worker processes aggregates the same
+    totals as the replicates run one by one, in the order of the seeds.
+    """
+
+    island_map = 'OOOO\nOJSO\nOOOO'
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(20)]}]
+    ensemble = BioSimEnsemble(island_map, ini_pop, seeds=range(6),
+                              max_workers=2)
+    ensemble.simulate(4)
+    runs = np.stack([run_replicate(island_map, ini_pop, seed, 4)
+                     for seed in range(6)])
+
+    assert ensemble.n_replicates == 6
+    assert np.allclose(ensemble.mean, runs.mean(axis=0))
+    assert np.all(ensemble.extinction_probability[:, 1] == 1)
+    assert np.all(ensemble.extinction_probability[:, 0] == 0)
+    assert sorted(ensemble.quantiles) == [0.05, 0.5, 0.95]
+    assert ensemble.quantiles[0.5].shape == (5, 2)
+    in_order = StreamingQuantiles((0.05, 0.5, 0.95))
+    for totals in runs:
+        in_order.add(totals)
+    assert np.array_equal(np.stack(list(ensemble.quantiles.values())),
+                          in_order.quantiles)
+
+
+def test_ensemble_invalid_engine():
+    """
+    Tests that an unknown engine is rejected before any worker starts.
+    """
+
+    with pytest.raises(ValueError):
+        BioSimEnsemble('OOO\nOJO\nOOO', [], seeds=[1], engine='unknown')
@@ -37,14 +37,64 @@ def test_distribute_animals():
     assert island.total_island_population != (0, 0)
 
 
-def test_random_landscapes():
+def test_active_coords():
     """
-    Tests that a list is created from the numpy.ndarray map.
+    Tests that each active cell index refers to its cell's coordinates.
     """
 
     island = Island()
-    island.map_from_string()
-    assert isinstance(island.get_random_landscapes(), list)
+    island.populated_island()
+    for index in island.active:
+        assert island.coords[index] == divmod(index, island.map.shape[1])
+
+
+def test_active_cells():
+    """
+    Tests that only populated cells are active, and that a cell becomes
+    active when animals migrate into it.
+    """
+
+    Herbivore.set_parameters({'mu': 1})
+    island = Island()
+    island.map_from_string("""OOOOO
+        OOOOO
+        OJJOO
+        OOOOO
+        OOOOO""")
+    assert island.active == set()
+    island.distribute_animals([{'loc': (3, 3),
+                                'pop': [{'species': 'Herbivore', 'age': 5,
+                                         'weight': 20}]}])
+    assert island.active == {12}
+    island.map[2, 2].pop_animals[0][0].phi = 1
+    island.migrate_island()
+    assert island.active == {11}
+    island.map[2, 1].f = 0
+    island.refresh_active()
+    assert island.active == {11}
+
+
+def test_cell_populated_directly():
+    """
+    Tests that animals placed with Landscape.populate_cell on a map cell
+    are counted and take part in the cycle.
+    """
+
+    Herbivore.set_parameters({'gamma': 0.2, 'omega': 0.4, 'mu': 0.25})
+    island = Island(seed=2)
+    island.map_from_string("""OOOO
+        OJJO
+        OOOO""")
+    island.map[1, 1].populate_cell([{'species': 'Herbivore', 'age': 5,
+                                     'weight': 20} for _ in range(20)])
+    assert island.total_island_population == (20, 0)
+    ages = {herb.age for herb in island.map[1, 1].pop_animals[0]}
+    assert ages == {5}
+    island.cycle()
+    assert island.active and island.active <= {5, 6}
+    herbs = island.map[1, 1].pop_animals[0] + island.map[1, 2].pop_animals[0]
+    assert 6 in {herb.age for herb in herbs} <= {1, 6}
+    assert island.total_island_population == (len(herbs), 0)
 
 
 def test_surrounding_landscapes():
@@ -69,6 +119,62 @@ def test_surrounding_landscapes():
     assert len(island.get_surrounding_landscapes([2, 2])) == 4
 
 
+def test_adjacency():
+    """
+    Tests that the compiled neighbour index lists the valid neighbours
+    of each cell, and flags cells without any as isolated.
+    """
+
+    island = Island()
+    island.map_from_string("""OOOOO
+    OJSOO
+    OMOOO
+    OOOOO""")
+    jungle, savannah = 6, 7
+    neighbours = island.neighbour_idx[island.neighbour_ptr[jungle]:
+                                      island.neighbour_ptr[jungle + 1]]
+    assert list(neighbours) == [savannah]
+    assert not island.isolated[jungle]
+    assert island.isolated[0]
+
+
+def test_isolated_migration():
+    """
+    Tests that animals in a cell without valid neighbours stay there.
+    """
+
+    Herbivore.set_parameters({'mu': 1})
+    island = Island()
+    island.map_from_string("""OOO
+    OJO
+    OOO""")
+    island.distribute_animals([{'loc': (2, 2),
+                                'pop': [{'species': 'Herbivore', 'age': 5,
+                                         'weight': 20}]}])
+    island.map[1, 1].pop_animals[0][0].phi = 1
+    island.migrate_island()
+    assert len(island.map[1, 1].pop_animals[0]) == 1
+
+
+def test_regenerate():
+    """
+    Tests that the island regenerates fodder for each landscape type,
+    and that each landscape's fodder is read from the island grid.
+    """
+
+    island = Island()
+    island.map_from_string("""OOOOO
+    OJSDO
+    OOOOO""")
+    island.fodder[:] = 0
+    island.regenerate()
+    assert island.map[1, 1].f == Jungle.default_params['f_max']
+    assert 0 < island.map[1, 2].f < Savannah.default_params['f_max']
+    assert island.map[1, 3].f == 0
+    island.map[1, 1].f = 10
+    assert island.fodder[1, 1] == 10
+
+
 def test_total_island_pop():
     """
     Given that the standard population in distribute animals method
@@ -117,3 +223,69 @@ def test_migration():
     island.migrate_island()
     assert len(island.map[2, 1].pop_animals[0]) == 1
 
+
+
+def test_cell_streams_independent():
+    """
+    Tests that the animals in a cell evolve the same way whether or not
+    other cells on the island hold animals.
+    """
+
+    herbs = [{'species': 'Herbivore', 'age': 5, 'weight': 30}
+             for _ in range(20)]
+    carns = [{'species': 'Carnivore', 'age': 5, 'weight': 30}
+             for _ in range(5)]
+    islands = []
+    for others in (False, True):
+        island = Island(seed=3)
+        island.map_from_string('OOOOOO\nOJJOJO\nOOOOOO')
+        island.distribute_animals([{'loc': (2, 5), 'pop': herbs + carns}])
+        if others:
+            island.distribute_animals([{'loc': (2, 2), 'pop': herbs}])
+        for _ in range(5):
+            island.cycle()
+        islands.append(island)
+
+    alone, shared = (island.map[1, 4].pop_animals for island in islands)
+    for first, second in zip(alone, shared):
+        assert [(a.weight, a.age) for a in first] == \
+            [(a.weight, a.age) for a in second]
+
+
+def test_islands_independent():
+    """
+    Tests that an island gives the same years for the same seed, whether
+    or not another island runs in between.
+    """
+
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(30)] +
+                       [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                        for _ in range(5)]}]
+    runs = []
+    for interleaved in (False, True):
+        island = Island(seed=1)
+        island.populated_island('OOOO\nOJJO\nOOOO', ini_pop)
+        other = Island(seed=2)
+        other.populated_island('OOOO\nOJJO\nOOOO', ini_pop)
+        years = []
+        for _ in range(5):
+            years.append(island.cycle())
+            if interleaved:
+                other.cycle()
+        runs.append(years)
+    assert runs[0] == runs[1]
+
+
+def test_year_counter():
+    """
+    Tests that the island counts the years it has run, which selects the
+    random streams of each year.
+    """
+
+    island = Island()
+    island.map_from_string('OOO\nOJO\nOOO')
+    island.cycle()
+    island.cycle()
+    assert island.year == 2
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Sigve Sorensen', 'Filip Rotnes'
+__email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
+
+from ..kernels import *
+from ..animals import *
+import pytest
+
+
+def test_fitness_matches_animal():
+    """
+    Tests that the batched fitness equals the fitness computed
+    by each animal.
+    """
+
+    herbs = [Herbivore(weight=w, age=a) for w, a in ((5, 0), (20, 7),
+                                                     (40, 60))]
+    phis = fitness(Herbivore.default_params, [h.age for h in herbs],
+                   [h.weight for h in herbs])
+    for herb, phi in zip(herbs, phis):
+        assert abs(herb.fitness() - phi) < 1e-12
+
+
+def test_age_factor_table_grows():
+    """
+    Tests that ages beyond the precomputed table are handled.
+    """
+
+    params = {'phi_age': 0.2, 'a_half': 40.0}
+    young, old = age_factor(params, np.array([0, 1000]))
+    assert young > 0.99
+    assert old < 1e-50
+
+
+def test_age_factor_fractional_ages():
+    """
+    Tests that fractional and negative ages are not rounded into the
+    table, but give the same fitness as the animal.
+    """
+
+    for age in (2.5, -1):
+        herb = Herbivore(weight=20, age=age)
+        phi = fitness(Herbivore.default_params, [herb.age], [herb.weight])
+        assert abs(herb.fitness() - phi[0]) < 1e-12
+
+
+def test_grazing():
+    """
+    Tests that grazing herbivores eat their appetite in order of rank
+    until the fodder runs out.
+    """
+
+    eaten = grazing(25.0, np.arange(4), 10.0)
+    assert list(eaten) == [10.0, 10.0, 5.0, 0.0]
+
+
+def test_births():
+    """
+    Tests that animals certain to give birth all do, that animals below
+    the weight threshold never do, and that one weight is drawn per birth.
+    """
+
+    params = {'zeta': 1.0, 'w_birth': 8.0, 'sigma_birth': 1.5, 'gamma': 1.0}
+    rng = np.random.default_rng(1)
+    weight = np.array([50.0, 50.0, 5.0])
+    parents, newborn_weight = births(params, weight, np.ones(3), 3, rng)
+    assert list(parents) == [0, 1]
+    assert newborn_weight.shape == (2,)
+
+
+def test_hunting_stops_at_appetite():
+    """
+    Tests that a carnivore certain to kill eats the least fit herbivores
+    first and stops once it has eaten its appetite.
+    """
+
+    herb_phi = np.array([0.5, 0.4, 0.3, 0.2, 0.1])
+    herb_weight = np.full(5, 20.)
+    carn_weight, carn_phi = np.array([30.]), np.array([0.9])
+    alive = hunting(np.array([0]), np.array([0, 5]), np.array([0, 1]),
+                    herb_phi, herb_weight, np.array([5]), carn_weight,
+                    carn_phi, np.random.default_rng(1), 50., 0.75, 0.01, 0.4,
+                    40., 0.4, 4.)
+    assert list(alive) == [True, True, False, False, False]
+    assert carn_weight[0] == 30 + 0.75 * 60
+    assert carn_phi[0] == pytest.approx(
+        fitness({'phi_age': 0.4, 'a_half': 40., 'phi_weight': 0.4,
+                 'w_half': 4.}, 5, carn_weight[0]))
+
+
+def test_hunting_fails():
+    """
+    Tests that no herbivore is killed by a carnivore that is not fitter.
+    """
+
+    carn_weight = np.array([30.])
+    alive = hunting(np.array([0]), np.array([0, 3]), np.array([0, 1]),
+                    np.full(3, 0.2), np.full(3, 20.), np.array([5]),
+                    carn_weight, np.array([0.2]), np.random.default_rng(1),
+                    50., 0.75, 10., 0.4, 40., 0.4, 4.)
+    assert alive.all()
+    assert carn_weight[0] == 30.
+
+
+def test_hunting_draws_lazily():
+    """
+    Tests that a hunt in a crowded cell draws about as many numbers as
+    attacks are made, not one for every carnivore and herbivore pair.
+    """
+
+    n_herbs, n_carns = 20000, 100
+    rng = np.random.default_rng(3)
+    alive = hunting(np.array([0]), np.array([0, n_herbs]),
+                    np.array([0, n_carns]), np.full(n_herbs, 0.1),
+                    np.full(n_herbs, 20.), np.full(n_carns, 5),
+                    np.full(n_carns, 30.), np.full(n_carns, 0.9), rng,
+                    50., 0.75, 0.01, 0.4, 40., 0.4, 4.)
+    assert (~alive).sum() == 3 * n_carns
+    assert rng.random() in np.random.default_rng(3).random(2000)
+
+
+def test_cohort_hunting():
+    """
+    Tests that carnivores certain to kill take herbivores from the least
+    fit cohort until they have eaten their appetite, and that carnivores
+    that are not fitter kill none.
+    """
+
+    count = np.array([3, 4])
+    carn_weight = np.array([30., 30.])
+    cohort_hunting(np.array([0]), np.array([0, 2]), np.array([0, 2]),
+                   np.array([0.2, 0.1]), np.full(2, 20.), count,
+                   np.array([5, 5]), carn_weight, np.array([0.9, 0.9]),
+                   np.random.default_rng(1), 50., 0.75, 0.01, 0.4, 40.,
+                   0.4, 4.)
+    assert list(count) == [1, 0]
+    assert list(carn_weight) == [30 + 0.75 * 60, 30 + 0.75 * 60]
+
+    count = np.array([5])
+    cohort_hunting(np.array([0]), np.array([0, 1]), np.array([0, 1]),
+                   np.array([0.5]), np.array([20.]), count, np.array([5]),
+                   np.array([30.]), np.array([0.4]),
+                   np.random.default_rng(1), 50., 0.75, 10., 0.4, 40., 0.4,
+                   4.)
+    assert list(count) == [5]
@@ -4,6 +4,7 @@ __author__ = 'Sigve Sorensen', 'Filip Rotnes'
 __email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
 
 from ..landscape import *
+import pytest
 
 
 def test_jungle():
@@ -102,6 +103,23 @@ def test_fitness_sort():
     assert phi5 > phi6
 
 
+def test_fitness_sort_many():
+    """
+    Tests that a large population is sorted by descending fitness,
+    with equally fit animals kept in their previous order.
+    """
+
+    jungle = Jungle()
+    herbs = [Herbivore() for _ in range(500)]
+    herbs[10].phi = herbs[20].phi = 0.5
+    jungle.pop_animals[0] = list(herbs)
+    jungle.fitness_sort()
+    phis = [herb.phi for herb in jungle.pop_animals[0]]
+    assert phis == sorted(phis, reverse=True)
+    sorted_herbs = jungle.pop_animals[0]
+    assert sorted_herbs.index(herbs[10]) < sorted_herbs.index(herbs[20])
+
+
 def test_eat_request_herb():
     """Tests if Herbivore eat in landscape"""
 
@@ -115,6 +133,24 @@ def test_eat_request_herb():
     assert w1 > w0
 
 
+def test_eat_request_herb_cutoff():
+    """
+    Tests that the fittest Herbivore eat their appetite, the next one
+    eats what is left, and the rest get nothing.
+    """
+
+    Herbivore.set_parameters({'F': 10.0, 'beta': 0.9})
+    jungle = Jungle()
+    jungle.f = 25.0
+    jungle.pop_animals[0] = [Herbivore(weight=20, age=5) for _ in range(4)]
+    w0 = [herb.weight for herb in jungle.pop_animals[0]]
+    jungle.eat_request_herb()
+    w1 = [herb.weight for herb in jungle.pop_animals[0]]
+    gains = [round(after - before, 6) for before, after in zip(w0, w1)]
+    assert gains == [9.0, 9.0, 4.5, 0.0]
+    assert jungle.f == 0
+
+
 def test_eat_requests_carn():
     """Tests if Carnivore eat in landscape"""
 
@@ -200,6 +236,35 @@ def test_aging():
     assert jungle.pop_animals[1][0].age == 1
 
 
+def test_end_of_year():
+    """
+    Tests that the fused end of year pass gives the same animals as
+    aging, weightloss, update_fitness and death called in turn.
+    """
+
+    Herbivore.set_parameters({'omega': 0.4})
+    Carnivore.set_parameters({'omega': 0.9})
+    herbs = [Herbivore(weight=w, age=3) for w in range(1, 40)]
+    carns = [Carnivore(weight=w, age=3) for w in range(1, 20)]
+    sequential, fused = Jungle(), Jungle()
+    for jungle in (sequential, fused):
+        jungle.pop_animals = [
+            [Herbivore.from_state(h.weight, h.age, h.phi) for h in herbs],
+            [Carnivore.from_state(c.weight, c.age, c.phi) for c in carns]]
+
+    randomness.seed(42)
+    sequential.aging()
+    sequential.weightloss()
+    sequential.update_fitness()
+    sequential.death()
+    randomness.seed(42)
+    fused.end_of_year()
+
+    for first, second in zip(sequential.pop_animals, fused.pop_animals):
+        assert [(a.age, a.weight, a.phi) for a in first] == \
+            [(a.age, a.weight, a.phi) for a in second]
+
+
 def test_regenerate():
     """
     Tests if Jungle- and Savannah landscapes regenerate fodder.
@@ -229,6 +294,45 @@ def test_regenerate():
     assert ocean.f == 0
 
 
+def test_cumulative_propensities():
+    """
+    Tests that the cumulative propensities increase with each neighbour,
+    and that herbivores prefer the neighbour with more fodder.
+    """
+
+    neighbours = [Desert(), Jungle()]
+    cum_props = Herbivore.cumulative_propensities(neighbours)
+    assert len(cum_props) == 2
+    assert cum_props[1] - cum_props[0] > cum_props[0]
+
+
+def test_herb_mass_stored():
+    """
+    Tests that the sum of Herbivore weights follows weight changes, and
+    that the sum stored for migration is used until migrants settle.
+    """
+
+    def fresh_sum(land):
+        return sum(herb.weight for herb in land.pop_animals[0])
+
+    Herbivore.set_parameters({'beta': 0.9, 'F': 10.})
+    jungle, savannah = Jungle(), Savannah()
+    jungle.populate_cell([{'species': 'Herbivore', 'age': 5,
+                           'weight': 20 + k} for k in range(30)])
+    assert jungle.sum_herb_mass == pytest.approx(fresh_sum(jungle))
+    jungle.pop_animals[0][0].eating(50)
+    assert jungle.sum_herb_mass == pytest.approx(fresh_sum(jungle))
+
+    jungle.store_herb_mass()
+    stored = jungle.sum_herb_mass
+    jungle.pop_animals[0][0].eating(50)
+    assert jungle.sum_herb_mass == stored
+    jungle.migrate([savannah])
+    for land in (jungle, savannah):
+        land.settle_migrants()
+        assert land.sum_herb_mass == pytest.approx(fresh_sum(land))
+
+
 #def test_abundance_fodder_herb():
 #    """
 #    Tests that the abundance of fodder in
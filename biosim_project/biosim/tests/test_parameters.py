@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Sigve Sorensen', 'Filip Rotnes'
+__email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
+
+from ..parameters import *
+from ..island import Island
+from ..engine import ArrayIsland
+from concurrent.futures import ThreadPoolExecutor
+import pickle
+import pytest
+
+
+def test_sets_isolated():
+    """
+    Tests that changing one parameter set changes neither another set nor
+    the class defaults, and that unknown classes are rejected.
+    """
+
+    beta = Herbivore.default_params['beta']
+    first = ParameterSet({'Herbivore': {'beta': beta / 2}})
+    second = ParameterSet()
+    assert first.herbivore.default_params['beta'] == beta / 2
+    assert first.herbivore._beta == beta / 2
+    assert second.herbivore.default_params['beta'] == beta
+    assert Herbivore.default_params['beta'] == beta
+    assert issubclass(first['Jungle'], Jungle)
+    with pytest.raises(KeyError):
+        ParameterSet({'Lion': {'F': 10}})
+
+
+def test_set_round_trip():
+    """
+    Tests that a set is rebuilt from as_dict and survives pickling.
+    """
+
+    params = ParameterSet({'Carnivore': {'F': 20.},
+                           'Savannah': {'alpha': 0.5}})
+    copy = pickle.loads(pickle.dumps(params))
+    assert copy.as_dict() == params.as_dict()
+    assert copy.carnivore.default_params['F'] == 20.
+    assert ParameterSet(params.as_dict()).as_dict() == params.as_dict()
+
+
+def test_landscapes_use_set():
+    """
+    Tests that landscapes of a set create animals of the set's species.
+    """
+
+    params = ParameterSet()
+    cell = params['Jungle']()
+    cell.populate_cell([{'species': 'Herbivore', 'age': 5, 'weight': 20},
+                        {'species': 'Carnivore', 'age': 5, 'weight': 20}])
+    assert type(cell.pop_animals[0][0]) is params.herbivore
+    assert type(cell.pop_animals[1][0]) is params.carnivore
+
+
+def herb_weight_after_eating(island):
+    """
+    Returns the weight of the only herbivore on the island after it eats
+    """
+
+    if isinstance(island, ArrayIsland):
+        island.absorb_animals()
+        island.eat_request_herb()
+        return island.herbs.weight[0]
+    cell = island.map[1, 1]
+    cell.eat_request_herb()
+    return cell.pop_animals[0][0].weight
+
+
+@pytest.mark.parametrize('island_class', [Island, ArrayIsland])
+def test_islands_use_set(island_class):
+    """
+    Tests that islands given different sets eat with their own parameters,
+    and leave the class defaults unchanged.
+    """
+
+    beta = Herbivore.default_params['beta']
+    island_map = 'OOO\nOJO\nOOO'
+    ini_pop = [{'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5,
+                                        'weight': 20}]}]
+    weights = []
+    for herb_beta in (0.5, 0.9):
+        params = ParameterSet({'Herbivore': {'beta': herb_beta, 'F': 10.,
+                                             'sigma_birth': 0.},
+                               'Jungle': {'f_max': 800.}})
+        island = island_class(params=params)
+        island.populated_island(island_map, ini_pop)
+        assert island.landscape_types['J'] is params['Jungle']
+        weights.append(herb_weight_after_eating(island))
+    assert weights == [25., 29.]
+    assert Herbivore.default_params['beta'] == beta
+
+
+def test_threads_independent():
+    """
+    Tests that simulations with their own parameters and seeds give the
+    same years when run at the same time in threads as when run alone.
+    """
+
+    island_map = 'OOOO\nOJSO\nOOOO'
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(30)] +
+                       [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                        for _ in range(5)]}]
+
+    def run(gamma):
+        island = Island(seed=4, params=ParameterSet(
+            {'Herbivore': {'gamma': gamma}}))
+        island.populated_island(island_map, ini_pop)
+        return [island.cycle() for _ in range(5)]
+
+    alone = [run(gamma) for gamma in (0.1, 0.8)]
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        threaded = list(pool.map(run, (0.1, 0.8)))
+    assert threaded == alone
+    assert alone[0] != alone[1]
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Sigve Sorensen', 'Filip Rotnes'
+__email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
+
+from ..population import *
+from ..kernels import fitness
+import pytest
+
+
+def test_from_animals():
+    """
+    Tests that an array store holds the weight, age and fitness
+    of the animals it is created from.
+    """
+
+    herbs = [Herbivore(weight=20, age=5) for _ in range(3)]
+    store = AnimalArrays.from_animals(Herbivore, herbs)
+    assert len(store) == 3
+    assert store.weight[1] == herbs[1].weight
+    assert store.age[2] == 5
+    assert store.phi[0] == herbs[0].phi
+
+
+def test_extend_grows_capacity():
+    """
+    Tests that the store grows when more animals are added
+    than there is room for.
+    """
+
+    store = AnimalArrays(Carnivore, capacity=2)
+    store.extend([1.0, 2.0, 3.0], [0, 1, 2], [0.1, 0.2, 0.3])
+    store.append(4.0, 3, 0.4)
+    assert len(store) == 4
+    assert list(store.weight) == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_keep():
+    """
+    Tests that only the masked animals are kept, in the same order.
+    """
+
+    store = AnimalArrays(Herbivore)
+    store.extend([1.0, 2.0, 3.0], [0, 1, 2], [0.1, 0.2, 0.3])
+    store.keep(np.array([True, False, True]))
+    assert list(store.age) == [0, 2]
+
+
+def test_discard():
+    """
+    Tests that discarding a few animals fills the holes from the end,
+    and that discarding many keeps the order of the survivors.
+    """
+
+    store = AnimalArrays(Herbivore)
+    store.extend(np.arange(20.0), np.arange(20), np.zeros(20))
+    dead = np.zeros(20, dtype=bool)
+    dead[3] = True
+    store.discard(dead)
+    assert len(store) == 19
+    assert 3 not in store.age
+    assert sorted(store.age) == [age for age in range(20) if age != 3]
+
+    survivors = [age for age in store.age if age % 2]
+    store.discard(store.age % 2 == 0)
+    assert list(store.age) == survivors
+
+
+def test_view():
+    """
+    Tests that an animal view acts like an animal, and that
+    changes made through the view are stored in the arrays.
+    """
+
+    store = AnimalArrays.from_animals(Herbivore, [Herbivore(20, 5)])
+    herb = store[0]
+    assert herb.is_herbivore
+    herb.ages()
+    herb.weightloss()
+    assert store.age[0] == 6
+    assert store.weight[0] == herb.weight
+    herb.fitness()
+    assert store.phi[0] == herb.phi
+
+
+def test_view_fitness_follows():
+    """
+    Tests that the fitness of a view follows changes of its weight and
+    age, and is never reported as outdated.
+    """
+
+    store = AnimalArrays.from_animals(Herbivore, [Herbivore(20, 5)])
+    herb = store[0]
+    herb.eating(10)
+    assert herb.phi == pytest.approx(
+        fitness(Herbivore.default_params, 5, herb.weight))
+    herb.weight = 5
+    herb.age = 30
+    assert store.phi[0] == pytest.approx(
+        fitness(Herbivore.default_params, 30, 5.))
+    assert not herb.phi_outdated
+
+
+def test_cohort_merge():
+    """
+    Tests that cohorts in the same cell, of the same age and weight bin
+    are joined with their mean weight, and that empty cohorts are dropped.
+    """
+
+    cohorts = CohortArrays(Herbivore)
+    cohorts.extend([20.1, 20.3, 20.2, 30.0, 25.0],
+                   [5, 5, 5, 5, 5], 0., [0, 0, 1, 0, 0], [1, 3, 2, 4, 0])
+    cohorts.merge(0.5)
+    assert cohorts.n == 3
+    assert cohorts.n_animals == 10
+    assert list(cohorts.cell) == [0, 0, 1]
+    assert list(cohorts.count) == [4, 4, 2]
+    assert cohorts.weight[0] == pytest.approx((20.1 + 3 * 20.3) / 4)
+    assert list(cohorts.phi) == list(fitness(Herbivore.default_params,
+                                             cohorts.age, cohorts.weight))
+    assert list(cohorts.cell_counts(3)) == [8, 2, 0]
+
+
+def test_cohort_gather():
+    """
+    Tests that cohorts can be split and expanded into single animals.
+    """
+
+    cohorts = CohortArrays(Carnivore)
+    cohorts.extend([10., 20.], [1, 2], [0.5, 0.6], 0, [2, 3])
+    cohorts.gather(np.repeat(np.arange(2), cohorts.count), 1)
+    assert list(cohorts.weight) == [10., 10., 20., 20., 20.]
+    assert list(cohorts.count) == [1] * 5
+    assert len(cohorts.to_animals()) == 5
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Sigve Sorensen', 'Filip Rotnes'
+__email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
+
+from .. import randomness
+from ..landscape import Jungle
+import numpy as np
+
+
+def test_streams_keyed():
+    """
+    Tests that a stream depends only on the root seed and its key, not on
+    the streams drawn from before it.
+    """
+
+    root = np.random.SeedSequence(5)
+    first = randomness.stream(root, 2, 7, 'migration').generator.random(3)
+    randomness.stream(root, 2, 8, 'migration').generator.random(10)
+    hunting = randomness.stream(root, 2, 7, 'hunting').generator.random(3)
+    again = randomness.stream(root, 2, 7, 'migration').generator.random(3)
+    assert list(again) == list(first)
+    assert list(hunting) != list(first)
+    other = randomness.stream(np.random.SeedSequence(6), 2, 7, 'migration')
+    assert list(other.generator.random(3)) != list(first)
+
+
+def test_uniforms():
+    """
+    Tests that uniforms drawn in blocks follow the generator of the stream
+    across block refills.
+    """
+
+    root = np.random.SeedSequence(0)
+    draws = randomness.uniforms(randomness.stream(root, 0, 3, 'hunting'))
+    first = [next(draws) for _ in range(3 * randomness.min_block)]
+    expected = randomness.stream(root, 0, 3, 'hunting').generator.random(
+        3 * randomness.min_block)
+    assert first == list(expected)
+
+
+def test_streams_lazy():
+    """
+    Tests that a stream is only seeded once it is used, and that phases of
+    an empty landscape leave it unused.
+    """
+
+    stream = randomness.stream(np.random.SeedSequence(1), 0, 3, 'reproduction')
+    cell = Jungle()
+    cell.death(stream)
+    cell.end_of_year(stream)
+    cell.reproduction(stream)
+    assert stream._generator is None
+    stream.generator.random()
+    assert stream._generator is not None
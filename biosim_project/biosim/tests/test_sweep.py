@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Sigve Sorensen', 'Filip Rotnes'
+__email__ = 'sigvsore@nmbu.no', 'firo@nmbu.no'
+
+from ..sweep import *
+from ..landscape import *
+import pytest
+
+
+def test_parameter_grid():
+    """
+    Tests that the grid holds every combination of values.
+    """
+
+    grid = parameter_grid({'Herbivore.beta': [0.8, 0.9],
+                           'Savannah.alpha': [0.1, 0.2, 0.3]})
+    assert len(grid) == 6
+    assert {'Herbivore.beta': 0.9, 'Savannah.alpha': 0.1} in grid
+
+
+def test_latin_hypercube():
+    """
+    Tests that each parameter samples every stratum of its range once.
+    """
+
+    points = latin_hypercube({'Carnivore.F': (10., 60.),
+                              'Herbivore.beta': (0.5, 1.)}, 10, seed=1)
+    assert len(points) == 10
+    strata = sorted(int((p['Carnivore.F'] - 10.) / 5.) for p in points)
+    assert strata == list(range(10))
+    assert all(0.5 <= p['Herbivore.beta'] < 1. for p in points)
+
+
+def test_point_restored():
+    """
+    Tests that running a point leaves the class parameters unchanged,
+    and that unknown classes are rejected.
+    """
+
+    beta, alpha = Herbivore.default_params['beta'], \
+        Savannah.default_params['alpha']
+    ini_pop = [{'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5,
+                                        'weight': 20}]}]
+    run_point('OOO\nOSO\nOOO', ini_pop, {'Herbivore.beta': 0.5,
+                                        'Savannah.alpha': 0.9}, 1, 1)
+    assert Herbivore.default_params['beta'] == beta
+    assert Savannah.default_params['alpha'] == alpha
+    assert Herbivore._beta == beta
+    with pytest.raises(KeyError):
+        run_point('OOO\nOSO\nOOO', ini_pop, {'Lion.F': 10}, 1, 1)
+
+
+def test_sweep(tmpdir):
+    """
+    Tests that a sweep gives one row per point, seed and year, with the
+    totals of the replicate run on its own.
+    """
+
+    island_map = 'OOOO\nOJSO\nOOOO'
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(20)]}]
+    points = parameter_grid({'Herbivore.beta': [0.5, 0.9]})
+    sweep = ParameterSweep(island_map, ini_pop, points, seeds=[1, 2],
+                           max_workers=2)
+    sweep.simulate(3)
+    assert len(sweep.rows) == 2 * 2 * 4
+    row = sweep.rows[-1]
+    expected = run_point(island_map, ini_pop, points[1], 2, 3)
+    assert (row['Herbivore.beta'], row['seed'], row['year']) == (0.9, 2, 3)
+    assert [row['Herbivores'], row['Carnivores']] == list(expected[-1])
+
+    frame = sweep.to_frame()
+    assert list(frame.columns) == sweep.columns
+    path = str(tmpdir.join('sweep.csv'))
+    sweep.write_csv(path)
+    with open(path) as file:
+        assert len(file.readlines()) == len(sweep.rows) + 1